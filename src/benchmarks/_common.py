@@ -0,0 +1,71 @@
+"""Shared helpers of the benchmarks.
+"""
+from contextlib import contextmanager
+from multiprocessing import Event, Process
+import gc
+import json
+import logging
+import time
+import tracemalloc
+
+from mash.server.routes.default import basepath
+from mash.server.server import serve_in_background
+
+
+def serve(port: int, ready: Event):
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    with serve_in_background(port=port):
+        ready.set()
+        Event().wait()
+
+
+@contextmanager
+def local_server(port: int):
+    """Run a server in a separate process and yield the url of a stable route.
+    """
+    ready = Event()
+    server = Process(target=serve, args=(port, ready), daemon=True)
+    server.start()
+    ready.wait()
+
+    try:
+        yield f'http://127.0.0.1:{port}{basepath}stable'
+    finally:
+        server.terminate()
+
+
+def measure(func, items: list) -> dict:
+    """Apply `func` to each item and return the duration and the memory of the results.
+    """
+    # e.g. compile classes before measuring
+    func(items[0])
+
+    t1 = time.perf_counter()
+    results = [func(item) for item in items]
+    dt = time.perf_counter() - t1
+    del results
+
+    # tracing slows down allocations, hence memory is measured separately
+    gc.collect()
+    tracemalloc.start()
+    results = [func(item) for item in items]
+    memory, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del results
+
+    n = len(items)
+    return {'duration': dt,
+            'records_per_second': n / dt,
+            'bytes_per_record': memory / n,
+            'peak_bytes_per_record': peak / n}
+
+
+def write_result(result: dict, output: str = None):
+    """Print a result as a JSON line, and optionally append it to a file.
+    """
+    line = json.dumps(result)
+    print(line)
+
+    if output:
+        with open(output, 'a') as f:
+            f.write(line + '\n')
@@ -0,0 +1,4 @@
+import sys
+
+# extend path to allow top-level modules to be imported
+sys.path.append('src')
@@ -0,0 +1,46 @@
+#!/usr/bin/python3
+"""Compare the client throughput of event loop implementations.
+
+The server runs in a separate process, such that the CPU time of the
+current process represents the client overhead.
+Results are printed as JSON lines.
+"""
+if __name__ == '__main__':
+    import _extend_path  # noqa
+
+import json
+import time
+
+from _common import local_server
+from mash.webtools.parallel import asynchronous, available_event_loops, some_custom_func
+
+
+def benchmark(event_loop, url: str, n=2000, concurrency=16) -> dict:
+    t1 = time.perf_counter()
+    cpu1 = time.process_time()
+
+    results, errors = asynchronous(some_custom_func, range(n),
+                                   concurrency=concurrency,
+                                   event_loop=event_loop,
+                                   url=url)
+
+    dt = time.perf_counter() - t1
+    cpu = time.process_time() - cpu1
+
+    return {'benchmark': 'event_loop',
+            'event_loop': event_loop.name,
+            'N': len(results),
+            'errors': len(errors),
+            'concurrency': concurrency,
+            'rps': len(results) / dt,
+            'rps_per_core': len(results) / cpu}
+
+
+def main(port=5057, n=2000, concurrency=16):
+    with local_server(port) as url:
+        for event_loop in available_event_loops():
+            print(json.dumps(benchmark(event_loop, url, n, concurrency)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/python3
+"""Measure the throughput of parsing (and rendering) large HTML tables.
+
+Cells either repeat a few distinct texts or are all distinct.
+Results are printed as JSON lines.
+"""
+if __name__ == '__main__':
+    import _extend_path  # noqa
+
+import json
+import time
+import yaml
+
+from mash.webtools.html_table_data import example_yaml_data, parse_json, render
+
+
+def generate_table(n: int, distinct: bool) -> dict:
+    data = yaml.load(example_yaml_data, yaml.Loader)
+    rows = data['rows'] * (n // len(data['rows']))
+    if distinct:
+        rows = [{'row': {k: [f'{text} _{i}_' for text in v] for k, v in row['row'].items()}}
+                for i, row in enumerate(rows)]
+
+    data['rows'] = rows
+    return data
+
+
+def benchmark(n=10_000, distinct=False) -> dict:
+    data = generate_table(n, distinct)
+    render.cache_clear()
+
+    t1 = time.perf_counter()
+    parse_json(data)
+    dt = time.perf_counter() - t1
+
+    return {'benchmark': 'html_table',
+            'distinct': distinct,
+            'N': n,
+            'duration': dt,
+            'rows_per_second': n / dt}
+
+
+def main():
+    for distinct in [False, True]:
+        print(json.dumps(benchmark(distinct=distinct)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/python3
+"""Measure how building objects scales with the number of worker processes.
+
+Results are printed as JSON lines. A process count of 0 refers to the current process.
+"""
+if __name__ == '__main__':
+    import _extend_path  # noqa
+
+import json
+import os
+import time
+
+from mash.object_parser import build_iter
+from mash.server.domain.css import Document, generate_style
+
+
+def benchmark(n=100_000, processes: int = None, chunksize=1000) -> dict:
+    records = [generate_style() for _ in range(n)]
+
+    t1 = time.perf_counter()
+    for _ in build_iter(Document, records, processes, chunksize):
+        pass
+    dt = time.perf_counter() - t1
+
+    return {'benchmark': 'object_parser_scaling',
+            'class': Document.__name__,
+            'processes': processes or 0,
+            'chunksize': chunksize,
+            'N': n,
+            'duration': dt,
+            'records_per_second': n / dt}
+
+
+def main():
+    print(json.dumps(benchmark()))
+    for processes in range(1, (os.cpu_count() or 1) + 1):
+        print(json.dumps(benchmark(processes=processes)))
+
+
+if __name__ == '__main__':
+    main()
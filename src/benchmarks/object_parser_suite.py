@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+"""Measure the throughput and memory usage of `object_parser.build` for different schemas.
+Objects are built with and without `__slots__` (see `object_parser.slotted`), or only validated.
+
+- flat: a single object with primitive fields (`css.Margin`).
+- nested: objects with nested objects and enums (`css.Document`).
+- deep: lists of objects with lists of objects (`examples.object_parser.Organization`).
+- list: a `css.Document` with a long list of elements.
+- dict: a `examples.object_parser.Team` with many stakeholders, i.e. a large `Dict[str, X]`.
+
+Results are printed as JSON lines, with one line per schema and factory.
+Use `--output` to append them to a file, such that runs can be compared.
+
+Usage
+-----
+
+.. code-block:: sh
+
+    python src/benchmarks/object_parser_suite.py --reference
+    python src/benchmarks/object_parser_suite.py -o results.jsonl
+"""
+if __name__ == '__main__':
+    import _extend_path  # noqa
+
+from argparse import ArgumentParser
+from copy import deepcopy
+from functools import partial
+
+from _common import measure, write_result
+from mash import io_util
+from mash.io_util import ArgparseWrapper, has_argument
+from mash.object_parser import JSONFactory, build, validate
+from mash.server.domain.css import Document, Margin, generate_style
+from examples.object_parser import Organization, Team, example_data
+
+
+def flat(width: int) -> dict:
+    return {'bottom': 0, 'left': 1.5, 'right': 2, 'top': 3}
+
+
+def nested(width: int) -> dict:
+    return generate_style()
+
+
+def deep(width: int) -> dict:
+    return deepcopy(example_data)
+
+
+def list_heavy(width: int) -> dict:
+    data = generate_style()
+    data['body'] *= width
+    return data
+
+
+def dict_heavy(width: int) -> dict:
+    team = deepcopy(example_data['departments'][0]['teams'][0])
+    team['stakeholders'] = {f'e{i}': f'user {i}' for i in range(width)}
+    return team
+
+
+schemas = {'flat': (Margin, flat),
+           'nested': (Document, nested),
+           'deep': (Organization, deep),
+           'list': (Document, list_heavy),
+           'dict': (Team, dict_heavy)}
+
+factories = {'build': build,
+             'slots': partial(build, slots=True),
+             'validate': validate,
+             'JSONFactory': lambda cls, data: JSONFactory(cls).build(data)}
+
+
+def benchmark(schema: str, factory='build', n=10_000, width=100) -> dict:
+    cls, generate = schemas[schema]
+    func = factories[factory]
+    records = [generate(width) for _ in range(n)]
+
+    result = {'benchmark': 'object_parser_suite',
+              'schema': schema,
+              'class': cls.__name__,
+              'factory': factory,
+              'N': n,
+              'width': width}
+    result.update(measure(partial(func, cls), records))
+    return result
+
+
+def main(n=10_000, width=100, selection=None, reference=False, output: str = None):
+    names = ['build', 'slots', 'validate']
+    if reference:
+        names.append('JSONFactory')
+
+    for schema in selection or schemas:
+        for factory in names:
+            # the reference implementation is much slower
+            k = n // 10 if factory == 'JSONFactory' else n
+            write_result(benchmark(schema, factory, k, width), output)
+
+
+def add_cli_args(parser: ArgumentParser):
+    if not has_argument(parser, 'n'):
+        parser.add_argument('-n', type=int, default=10_000,
+                            help='Number of records per schema')
+        parser.add_argument('--width', type=int, default=100,
+                            help='Number of items of the list and dict schemas')
+        parser.add_argument('--schema', nargs='*', choices=list(schemas),
+                            help='Only use these schemas')
+        parser.add_argument('--reference', action='store_true',
+                            help='Include the reference implementation JSONFactory')
+        parser.add_argument('-o', '--output', default=None,
+                            help='Append the results to a .jsonl file')
+
+
+if __name__ == '__main__':
+    with ArgparseWrapper(description=__doc__) as parser:
+        add_cli_args(parser)
+
+    args = io_util.parse_args
+    main(args.n, args.width, args.schema, args.reference, args.output)
@@ -0,0 +1,41 @@
+#!/usr/bin/python3
+"""Compare the throughput of a PushPull pipeline for different batch sizes.
+
+Results are printed as JSON lines.
+"""
+if __name__ == '__main__':
+    import _extend_path  # noqa
+
+import json
+import time
+
+from mash.webtools.pipeline import PushPull, Strategy, identity
+
+
+def benchmark(batch_size: int, n=100_000, n_stages=2) -> dict:
+    items = range(n)
+    processors = [identity] * n_stages
+
+    t1 = time.perf_counter()
+    with PushPull(processors=processors, strategy=Strategy.push,
+                  batch_size=batch_size) as pipeline:
+        pipeline.extend(items)
+        for _ in items:
+            pipeline.process()
+
+    dt = time.perf_counter() - t1
+    return {'benchmark': 'pipeline_batching',
+            'batch_size': batch_size,
+            'N': n,
+            'stages': n_stages,
+            'duration': dt,
+            'items_per_second': n / dt}
+
+
+def main():
+    for batch_size in (1, 64, 1024):
+        print(json.dumps(benchmark(batch_size)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+"""Compare the throughput and latency of a PushPull pipeline for each Strategy and Backend.
+
+- throughput: push a burst of items and wait for all results.
+- latency: process one item at a time and measure the round-trip time.
+
+Results are printed as JSON lines.
+"""
+if __name__ == '__main__':
+    import _extend_path  # noqa
+
+import json
+import time
+
+from mash.webtools.metrics import latency_statistics
+from mash.webtools.pipeline import Backend, PushPull, Strategy, identity
+
+
+def throughput(strategy: Strategy, backend=Backend.process, n=10_000, n_stages=2, credits=1) -> dict:
+    processors = [identity] * n_stages
+
+    with PushPull(processors=processors, strategy=strategy,
+                  credits=credits, backend=backend) as pipeline:
+        t1 = time.perf_counter()
+        pipeline.extend(range(n))
+        for _ in range(n):
+            pipeline.process()
+
+        dt = time.perf_counter() - t1
+
+    return {'benchmark': 'pipeline_strategies',
+            'strategy': strategy.name,
+            'backend': backend.name,
+            'credits': credits,
+            'N': n,
+            'stages': n_stages,
+            'duration': dt,
+            'items_per_second': n / dt}
+
+
+def latency(strategy: Strategy, backend=Backend.process, n=1_000, n_stages=2, credits=1) -> dict:
+    processors = [identity] * n_stages
+    times = []
+
+    with PushPull(processors=processors, strategy=strategy,
+                  credits=credits, backend=backend) as pipeline:
+        for _ in range(n):
+            # perf_counter is monotonic across processes
+            t1 = pipeline.process(time.perf_counter())
+            times.append(time.perf_counter() - t1)
+
+    result = {'benchmark': 'pipeline_strategies_latency',
+              'strategy': strategy.name,
+              'backend': backend.name,
+              'credits': credits,
+              'N': n,
+              'stages': n_stages}
+    result.update(latency_statistics(times))
+    return result
+
+
+def main():
+    for strategy in Strategy:
+        for credits in (1, 16):
+            print(json.dumps(throughput(strategy, credits=credits)))
+
+    for strategy in Strategy:
+        print(json.dumps(latency(strategy)))
+
+    for backend in Backend:
+        print(json.dumps(throughput(Strategy.push, backend)))
+        print(json.dumps(latency(Strategy.push, backend)))
+
+
+if __name__ == '__main__':
+    main()
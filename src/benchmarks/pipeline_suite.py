@@ -0,0 +1,163 @@
+#!/usr/bin/python3
+"""Measure the throughput and per-item latency of PushPull pipelines.
+
+Each parameter (strategy, number of stages, payload size, number of workers per stage)
+is varied separately around a baseline configuration.
+Stages either compute a checksum of the payload (pure CPU) or request a local HTTP server.
+
+Results are printed as JSON lines, with one line per configuration.
+Use `--output` to append them to a file, such that runs can be compared.
+
+Usage
+-----
+
+.. code-block:: sh
+
+    python src/benchmarks/pipeline_suite.py --quick
+    python src/benchmarks/pipeline_suite.py -o results.jsonl
+"""
+if __name__ == '__main__':
+    import _extend_path  # noqa
+
+from argparse import ArgumentParser
+from urllib.request import urlopen
+import hashlib
+import time
+
+from _common import local_server, write_result
+from mash import io_util
+from mash.io_util import ArgparseWrapper, has_argument
+from mash.webtools.metrics import latency_statistics
+from mash.webtools.pipeline import Backend, Processor, PushPull, Strategy
+
+baseline = {'strategy': Strategy.push,
+            'n_stages': 2,
+            'payload_size': 1024,
+            'n_workers': 1}
+
+variations = {'strategy': list(Strategy),
+              'n_stages': [1, 2, 4],
+              'payload_size': [16, 1024, 2**16],
+              'n_workers': [1, 2, 4]}
+
+
+def checksum_(item):
+    t, payload = item
+    hashlib.sha256(payload).digest()
+    return t, payload
+
+
+checksum = Processor.from_function(checksum_)
+
+
+class Request(Processor):
+    def __init__(self, url: str):
+        """Request a local server for each item, as a stand-in for remote services.
+        """
+        super().__init__()
+        self.url = url
+
+    def process_item(self, item):
+        with urlopen(self.url, timeout=10) as response:
+            response.read()
+
+        return item
+
+
+def timed(n: int, payload_size: int):
+    """Yield pairs (input time, payload).
+    Note that perf_counter is monotonic across processes.
+    """
+    payload = bytes(payload_size)
+    for _ in range(n):
+        yield time.perf_counter(), payload
+
+
+def benchmark(processor: Processor, strategy=Strategy.push, n_stages=2,
+              payload_size=1024, n_workers=1, backend=Backend.process,
+              n=1000, credits=1) -> dict:
+    processors = [(processor, n_workers)] * n_stages
+    times = []
+
+    with PushPull(processors=processors, strategy=strategy, credits=credits,
+                  backend=backend) as pipeline:
+        t1 = time.perf_counter()
+        for t, _ in pipeline.imap(timed(n, payload_size)):
+            times.append(time.perf_counter() - t)
+
+        dt = time.perf_counter() - t1
+        stages = pipeline.stats()
+
+    bottleneck = max(stages, key=lambda row: row['utilization'])
+    result = {'benchmark': 'pipeline_suite',
+              'processor': getattr(processor, '__name__', type(processor).__name__),
+              'strategy': strategy.name,
+              'backend': backend.name,
+              'credits': credits,
+              'N': len(times),
+              'stages': n_stages,
+              'workers': n_workers,
+              'payload_size': payload_size,
+              'duration': dt,
+              'items_per_second': len(times) / dt,
+              'bottleneck': bottleneck['stage'],
+              'utilization': bottleneck['utilization']}
+    result.update(latency_statistics(times))
+    return result
+
+
+def configurations(quick=False):
+    """Yield the baseline configuration and each variation of a single parameter.
+    """
+    yield dict(baseline)
+    for key, values in variations.items():
+        if quick:
+            values = values[:1] + values[-1:]
+
+        for value in values:
+            if value != baseline[key]:
+                yield {**baseline, key: value}
+
+
+def run(processor: Processor, n: int, backend=Backend.process, quick=False,
+        output: str = None):
+    for config in configurations(quick):
+        result = benchmark(processor, n=n, backend=backend, **config)
+        write_result(result, output)
+
+
+def main(n=1000, n_requests=200, port=5058, backend=Backend.process,
+         quick=False, http=True, output: str = None):
+    run(checksum, n, backend, quick, output)
+
+    if not http:
+        return
+
+    with local_server(port) as url:
+        run(Request(url), n_requests, backend, quick, output)
+
+
+def add_cli_args(parser: ArgumentParser):
+    if not has_argument(parser, 'n'):
+        parser.add_argument('-n', type=int, default=1000,
+                            help='Number of items per CPU-bound configuration')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Number of items per HTTP-bound configuration')
+        parser.add_argument('--port', type=int, default=5058)
+        parser.add_argument('--backend', default=Backend.process.name,
+                            choices=[b.name for b in Backend])
+        parser.add_argument('--quick', action='store_true',
+                            help='Only use the extreme values of each parameter')
+        parser.add_argument('--no-http', action='store_true',
+                            help='Skip the HTTP-bound configurations')
+        parser.add_argument('-o', '--output', default=None,
+                            help='Append the results to a .jsonl file')
+
+
+if __name__ == '__main__':
+    with ArgparseWrapper(description=__doc__) as parser:
+        add_cli_args(parser)
+
+    args = io_util.parse_args
+    main(args.n, args.requests, args.port, Backend[args.backend],
+         args.quick, not args.no_http, args.output)
@@ -1,17 +1,43 @@
-
 if __name__ == '__main__':
     import _extend_path  # noqa
 
+from argparse import ArgumentParser
 import time
+
+from mash import io_util
+from mash.io_util import ArgparseWrapper, has_argument
+from mash.webtools.parallel import EventLoop, search_concurrency
 from mash.webtools.pipeline import PushPull, Strategy
-from mash.webtools.parallel_requests import compute
+from mash.webtools.parallel_requests import compute, load_test
+from mash.webtools.scenario import Scenario
 
 
-if __name__ == '__main__':
-    # test_compute_pipeline()
+def add_cli_args(parser: ArgumentParser):
+    if not has_argument(parser, 'scenario'):
+        parser.add_argument('scenario', default='', nargs='?',
+                            help='A scenario file in .yaml format. ' +
+                            'Run a pipeline benchmark if omitted.')
+        parser.add_argument('-n', type=int, default=1000,
+                            help='Total number of requests')
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Timeout in seconds')
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Number of connections per thread')
+        parser.add_argument('--batch-size', type=int, default=16)
+        parser.add_argument('-o', '--output', default=None,
+                            help='Write a time series to a .csv or .jsonl file')
+        parser.add_argument('--event-loop', default='default',
+                            choices=[e.name for e in EventLoop])
+        parser.add_argument('--search', action='store_true',
+                            help='Increase the concurrency until a threshold is crossed. ' +
+                            'Use --concurrency to set the max. concurrency.')
+        parser.add_argument('--max-p99', type=float, default=1.,
+                            help='Max. sustainable p99 latency in seconds')
+        parser.add_argument('--max-error-rate', type=float, default=0.01)
 
-    # run_compute_pipeline()
 
+def benchmark_strategies():
     PushPull.n_processors = 2
     for s in Strategy:
         t1 = time.perf_counter()
@@ -19,3 +45,24 @@ if __name__ == '__main__':
         t2 = time.perf_counter()
 
         print(f'{s:<20} {t2 - t1:.2f} s')
+
+
+if __name__ == '__main__':
+    with ArgparseWrapper() as parser:
+        add_cli_args(parser)
+
+    args = io_util.parse_args
+    if not args.scenario:
+        benchmark_strategies()
+    elif args.search:
+        search_concurrency(Scenario.read(args.scenario).request,
+                           n_threads=args.threads,
+                           max_concurrency=args.concurrency,
+                           max_p99=args.max_p99,
+                           max_error_rate=args.max_error_rate,
+                           duration=args.duration,
+                           event_loop=args.event_loop)
+    else:
+        load_test(Scenario.read(args.scenario), args.n, args.duration,
+                  args.batch_size, args.threads, args.concurrency,
+                  args.output, args.event_loop)
@@ -1,5 +1,9 @@
 # explicit API exposure
 # "noqa" suppresses linting errors (flake8)
+from mash.object_parser.compiler import compile_plan, Plan  # noqa
 from mash.object_parser.errors import BuildError, BuildErrors, ErrorMessages, SpecError  # noqa
-from mash.object_parser.factory import build, JSONFactory  # noqa
+from mash.object_parser.factory import build, build_iter, build_many, JSONFactory, validate  # noqa
 from mash.object_parser.oas import OAS, path_create  # noqa
+from mash.object_parser.serializer import deserialize, serialize  # noqa
+from mash.object_parser.slots import slotted  # noqa
+from mash.object_parser.stream import build_stream, iter_json  # noqa
@@ -0,0 +1,499 @@
+"""Compile classes into reusable build plans.
+
+A `Plan` analyses a class once: its fields, inner types, key synonyms, defaults and hooks.
+Building an object then only requires a few dictionary lookups per field,
+rather than a new `JSONFactory` per field.
+
+Plans are cached per class. They produce the same objects and errors as `JSONFactory`.
+
+Usage
+-----
+
+.. code-block:: python
+
+    plan = compile_plan(Document)
+    documents = [plan.build(item) for item in items]
+"""
+from collections.abc import Hashable
+from dataclasses import MISSING, fields
+from typing import _GenericAlias
+import logging
+
+from mash.object_parser.object_parser import parse_field_key
+from mash.object_parser.errors import BuildError, BuildErrors, ErrorMessages, SpecError
+from mash.util import has_annotations, has_method, infer_inner_cls, is_Dict, is_Dict_or_List, is_List, is_enum, \
+    is_valid_method_name
+
+# types that are returned as-is if the input has exactly this type
+primitives = (bool, float, int, str)
+
+# JSON types other than objects
+non_mappings = frozenset((bool, float, int, str, list, type(None)))
+
+plans = {}
+
+
+def compile_plan(cls: type, errors=ErrorMessages) -> 'Plan':
+    """Return the (cached) build plan of `cls`.
+    """
+    key = (cls, errors)
+    try:
+        return plans[key]
+    except KeyError:
+        pass
+
+    plan = Plan(cls, errors)
+    plans[key] = plan
+    return plan
+
+
+class Plan:
+    def __init__(self, cls: type, errors=ErrorMessages):
+        """Analyse `cls` such that instances can be built without further introspection.
+
+        Note that the plans of inner types are compiled on first use,
+        such that classes can refer to themselves.
+        """
+        self.cls = cls
+        self.errors = errors
+
+        self.parse_value = cls.parse_value if has_method(cls, 'parse_value') else None
+        self.post_init = has_method(cls, '__post_init__')
+        self.is_alias = isinstance(cls, _GenericAlias)
+        self.is_enum = is_enum(cls)
+        self.members = dict(cls.__members__) if self.is_enum else {}
+        self.is_dict = is_Dict(cls)
+        self.is_list = is_List(cls)
+        self.is_container = is_Dict_or_List(cls)
+        self.is_dataclass = hasattr(cls, '__dataclass_fields__')
+        self.is_primitive = cls in primitives
+        # whether a dataclass has fields without defaults
+        self.required = self.is_dataclass and any(
+            f.init and f.default is MISSING and f.default_factory is MISSING
+            for f in fields(cls))
+
+        self.annotations = dict(cls.__annotations__) if has_annotations(cls) else {}
+        self.verify_key = cls.verify_key_format if has_method(cls, 'verify_key_format') else None
+        self.custom_keys = self.verify_key is not None or has_method(cls, 'parse_key')
+        self.key_map = self.compile_key_map()
+
+        # per field: key, inner type, whether there is a default and the default
+        self.fields = []
+        for key, inner_cls in self.annotations.items():
+            self.fields.append((key, inner_cls, *field_default(cls, key)))
+
+        # fields that are not allowed as input keys
+        self.invalid_keys = {key for key in self.annotations
+                             if not is_valid_key(key)}
+        self.verify_keys = self.verify_key is not None or bool(self.invalid_keys)
+
+        self._field_plans = None
+        self._inner_plan = None
+        self._empty_error = MISSING
+
+    def build(self, data, path=()):
+        """Initialize `self.cls` with fields from `data`, see `JSONFactory.build`.
+
+        Parameters
+        ----------
+            path : the keys of the parent objects, which are used in error messages.
+        """
+        if self.parse_value is not None:
+            data = self.parse_value(data)
+
+        instance = self.build_instance(data, path)
+
+        if self.post_init:
+            instance.__post_init__()
+
+        return instance
+
+    def build_instance(self, data, path=()):
+        if isinstance(data, _GenericAlias):
+            raise BuildError(
+                f'Cannot instantiate class {self.cls} with data {data}')
+
+        if is_mapping(data):
+            fields = self.build_fields(data, path)
+            return self.build_from_dict(fields)
+
+        elif self.is_alias:
+            return self.build_list(data, path)
+
+        if self.is_enum:
+            return self.build_enum(data)
+
+        return self.build_object(data, path)
+
+    ############################################################################
+    # Internals
+    ############################################################################
+
+    @property
+    def field_plans(self) -> list:
+        if self._field_plans is None:
+            self._field_plans = [(key, compile_plan(inner_cls), has_default, default)
+                                 for key, inner_cls, has_default, default in self.fields]
+        return self._field_plans
+
+    @property
+    def inner_plan(self) -> 'Plan':
+        """Return the plan of the items of a Dict or List.
+        """
+        if self._inner_plan is None:
+            self._inner_plan = compile_plan(infer_inner_cls(self.cls))
+        return self._inner_plan
+
+    def compile_key_map(self) -> dict:
+        """Map each valid input key to a field, including synonyms.
+        Other keys are handled by `parse_field_key`.
+        """
+        if self.is_container or self.custom_keys:
+            return {}
+
+        key_map = {}
+        synonyms = getattr(self.cls, '_key_synonyms', {})
+        for original_key, keys in synonyms.items():
+            for key in keys:
+                if is_valid_key(key):
+                    key_map.setdefault(key, original_key)
+
+        for key in self.annotations:
+            if is_valid_key(key):
+                key_map[key] = key
+
+        return key_map
+
+    def parse_keys(self, data) -> dict:
+        if self.is_container:
+            return data
+
+        if self.custom_keys:
+            return {parse_field_key(self.cls, k): v for k, v in data.items()}
+
+        key_map = self.key_map
+        result = {}
+        for k, v in data.items():
+            key = key_map.get(k)
+            if key is None:
+                key = parse_field_key(self.cls, k)
+
+            result[key] = v
+
+        return result
+
+    def build_fields(self, data, path) -> dict:
+        data = self.parse_keys(data)
+
+        result = {}
+        if not data:
+            return result
+
+        elif self.is_container:
+            return self.build_items(data, path)
+
+        elif not self.annotations:
+            raise BuildError(self.errors.no_type_annotations(self.cls))
+
+        verify_keys = self.verify_keys
+        errors = []
+        for key, plan, has_default, default in self.field_plans:
+            # fields are independent, hence multiple errors can be collected
+            try:
+                if key in data:
+                    if verify_keys:
+                        self.verify_field_key(key)
+
+                    result[key] = self.build_field(key, data[key], plan, path)
+                elif has_default:
+                    result[key] = default
+                else:
+                    msg = self.errors.missing_mandatory_key(self.cls, key)
+                    raise BuildError(error_prefix(path) + msg)
+
+            except SpecError as e:
+                errors.append(e)
+
+        if errors:
+            raise BuildErrors(errors)
+
+        return result
+
+    def build_items(self, data: dict, path) -> dict:
+        """Build the values of a Dict or List. Invalid values are omitted,
+        unless all values are invalid.
+        """
+        plan = self.inner_plan
+        result = {}
+        errors = []
+        for key, value in data.items():
+            try:
+                result[key] = self.build_field(key, value, plan, path)
+            except SpecError as e:
+                errors.append(e)
+
+        if errors and len(errors) == len(data):
+            raise BuildErrors(errors)
+
+        return result
+
+    def verify_field_key(self, key: str):
+        if self.verify_key is not None:
+            self.verify_key(key)
+        elif key in self.invalid_keys:
+            raise SpecError(ErrorMessages.invalid_key_format(self.cls, key))
+
+    def build_field(self, key, value, plan: 'Plan', path):
+        if isinstance(value, type):
+            msg = f'Data must be instantiated. Types are not supported. Got {value}'
+            raise BuildError(error_prefix(path) + msg)
+
+        return plan.build(value, path + (key,))
+
+    def build_from_dict(self, fields: dict):
+        if self.is_dataclass:
+            try:
+                return self.cls(**fields)
+            except TypeError:
+                pass
+
+        if self.is_dict:
+            return fields
+
+        if self.is_list:
+            return list(fields.values())
+
+        try:
+            instance = self.cls()
+        except TypeError:
+            raise BuildError('Invalid input')
+
+        # assume instance of Spec
+        for k in self.annotations:
+            if k not in fields:
+                raise BuildError()
+
+            setattr(instance, k, fields[k])
+
+        return instance
+
+    def build_list(self, items, path) -> list:
+        assert len(self.cls.__args__) == 1
+
+        if not is_iterable(items):
+            raise BuildError(error_prefix(path) + f'Expected a list, got {type(items).__name__}')
+
+        plan = self.inner_plan
+        result = []
+        for v in items:
+            try:
+                result.append(plan.build(v, path))
+            except BuildErrors as e:
+                logging.debug(
+                    f'build_list: factory({plan.cls}).build({v}) failed: {e}')
+
+        return result
+
+    def build_enum(self, value):
+        if self.parse_value is not None:
+            value = self.parse_value(value)
+
+        try:
+            return self.cls[value]
+        except (KeyError, TypeError):
+            # e.g. unhashable values
+            raise BuildError(f'Invalid value for {self.cls}(Enum)')
+
+    def build_object(self, data, path):
+        if self.is_primitive and type(data) is self.cls:
+            return data
+
+        try:
+            return self.cls(data)
+        except (TypeError, ValueError) as e:
+            raise BuildError(error_prefix(path) + str(e))
+
+    ############################################################################
+    # Validation
+    ############################################################################
+
+    def check(self, data, path=(), first=False) -> SpecError:
+        """Return the error that `build` would raise, or None if `data` is valid.
+        Instances of classes with fields are not created.
+        Hence their constructors and `__post_init__` methods are not called.
+
+        Parameters
+        ----------
+            first : stop at the first invalid field of each object.
+        """
+        try:
+            if self.parse_value is not None:
+                data = self.parse_value(data)
+
+            return self.check_instance(data, path, first)
+        except SpecError as e:
+            return e
+
+    def check_instance(self, data, path, first) -> SpecError:
+        if isinstance(data, _GenericAlias):
+            return BuildError(
+                f'Cannot instantiate class {self.cls} with data {data}')
+
+        if is_mapping(data):
+            return self.check_fields(data, path, first)
+
+        elif self.is_alias:
+            return self.check_list(data, path, first)
+
+        if self.is_enum:
+            return self.check_enum(data)
+
+        return self.check_object(data, path)
+
+    def check_fields(self, data, path, first) -> SpecError:
+        data = self.parse_keys(data)
+
+        if not data:
+            return self.check_empty()
+
+        elif self.is_container:
+            return self.check_items(data, path, first)
+
+        elif not self.annotations:
+            return BuildError(self.errors.no_type_annotations(self.cls))
+
+        errors = []
+        for key, plan, has_default, _ in self.field_plans:
+            error = self.check_key(key, data, plan, has_default, path, first)
+            if error is not None:
+                errors.append(error)
+                if first:
+                    break
+
+        if errors:
+            return BuildErrors(errors)
+
+    def check_key(self, key, data: dict, plan: 'Plan', has_default, path, first) -> SpecError:
+        if key not in data:
+            if has_default:
+                return None
+
+            msg = self.errors.missing_mandatory_key(self.cls, key)
+            return BuildError(error_prefix(path) + msg)
+
+        if self.verify_keys:
+            try:
+                self.verify_field_key(key)
+            except SpecError as e:
+                return e
+
+        return self.check_field(key, data[key], plan, path, first)
+
+    def check_empty(self) -> SpecError:
+        """Return the error of `build_from_dict` for an empty mapping, if any.
+        The result is computed once, because it may require an instance of `self.cls`.
+        """
+        if self._empty_error is not MISSING:
+            return self._empty_error
+
+        error = None
+        if self.is_dataclass and not self.required or self.is_container:
+            pass
+        else:
+            try:
+                self.cls()
+            except TypeError:
+                error = BuildError('Invalid input')
+            else:
+                if self.annotations:
+                    # a class with annotations that is not a dataclass
+                    error = BuildError()
+
+        self._empty_error = error
+        return error
+
+    def check_items(self, data: dict, path, first) -> SpecError:
+        plan = self.inner_plan
+        errors = []
+        for key, value in data.items():
+            error = self.check_field(key, value, plan, path, first)
+            if error is None:
+                # a Dict or List is valid if any of its values is valid
+                return None
+
+            errors.append(error)
+
+        return BuildErrors(errors)
+
+    def check_field(self, key, value, plan: 'Plan', path, first) -> SpecError:
+        if isinstance(value, type):
+            msg = f'Data must be instantiated. Types are not supported. Got {value}'
+            return BuildError(error_prefix(path) + msg)
+
+        return plan.check(value, path + (key,), first)
+
+    def check_list(self, items, path, first) -> SpecError:
+        assert len(self.cls.__args__) == 1
+
+        if not is_iterable(items):
+            return BuildError(error_prefix(path) + f'Expected a list, got {type(items).__name__}')
+
+        plan = self.inner_plan
+        for v in items:
+            error = plan.check(v, path, first)
+            # invalid items are omitted by build_list
+            if error is not None and not isinstance(error, BuildErrors):
+                return error
+
+    def check_enum(self, value) -> SpecError:
+        if self.parse_value is not None:
+            value = self.parse_value(value)
+
+        if not isinstance(value, Hashable) or value not in self.members:
+            return BuildError(f'Invalid value for {self.cls}(Enum)')
+
+    def check_object(self, data, path) -> SpecError:
+        if self.is_primitive and type(data) is self.cls:
+            return None
+
+        try:
+            self.cls(data)
+        except (TypeError, ValueError) as e:
+            return BuildError(error_prefix(path) + str(e))
+
+
+def field_default(cls: type, key: str) -> tuple:
+    """Return whether a field has a default value, and the default value.
+    Note that the fields of slotted dataclasses are class attributes, even without defaults.
+    """
+    f = getattr(cls, '__dataclass_fields__', {}).get(key)
+    if f is not None:
+        return f.default is not MISSING, f.default
+
+    if hasattr(cls, key):
+        return True, getattr(cls, key)
+
+    return False, None
+
+
+def is_valid_key(key) -> bool:
+    """See `object_parser.verify_key_format`.
+    """
+    return not key.startswith('_') and is_valid_method_name(key)
+
+
+def is_mapping(data) -> bool:
+    t = type(data)
+    return t is dict or (t not in non_mappings and has_method(data, 'items'))
+
+
+def is_iterable(data) -> bool:
+    try:
+        iter(data)
+        return True
+    except TypeError:
+        return False
+
+
+def error_prefix(path) -> str:
+    return '.'.join(path) + ': '
@@ -1,3 +1,6 @@
+from typing import List
+
+
 class SpecError(Exception):
     pass
 
@@ -15,13 +18,19 @@ class BuildErrors(SpecError):
 
 
 def to_string(errors: BuildErrors) -> str:
-    try:
-        return '\n'.join(error.args[0] for error in errors.args[0])
-    except TypeError:
-        # TODO fix recursion bug
-        # TypeError: sequence item 0: expected str instance, list found
-        # mash.object_parser.errors.BuildErrors: [BuildErrors([BuildErrors([BuildError("header.margin.left: could not convert string to float: 'null'")])]), BuildErrors([BuildErrors([BuildError("footer.margin.left: could not convert string to float: 'null'")])])]
-        return '\n'.join(str(error) for error in errors.args[0])
+    return '\n'.join(flatten(errors))
+
+
+def flatten(error: SpecError) -> List[str]:
+    """Return the messages of all (nested) errors.
+    """
+    if isinstance(error, BuildErrors):
+        return [msg for inner in error.args[0] for msg in flatten(inner)]
+
+    if error.args:
+        return [str(error.args[0])]
+
+    return [type(error).__name__]
 
 
 class ErrorMessages:
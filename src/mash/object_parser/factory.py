@@ -1,17 +1,159 @@
-from typing import _GenericAlias, List
+from typing import _GenericAlias, Dict, Iterable, Iterator, List, Tuple
+from collections import deque
 from enum import Enum
 from abc import ABC, abstractmethod
+from itertools import islice
 import logging
+import multiprocessing as mp
 
+from mash.object_parser.compiler import Plan, compile_plan
 from mash.object_parser.object_parser import parse_field_keys, verify_key_format
-from mash.object_parser.errors import BuildError, BuildErrors, ErrorMessages, SpecError
+from mash.object_parser.slots import slotted
+from mash.object_parser.errors import BuildError, BuildErrors, ErrorMessages, SpecError, flatten
 from mash.util import has_annotations, has_method, infer_inner_cls, is_Dict_or_List, is_Dict, is_List, is_enum
 
 
-def build(cls: type, json: dict):
+# the plan of a worker process, see `build_iter`
+worker_plan: Plan = None
+
+
+def build(cls: type, json: dict, slots=False, frozen=False):
     """Initialize `cls` with fields from `data`.
+    The class is analysed once, see `compiler.compile_plan`.
+
+    Parameters
+    ----------
+        slots : build a variant of `cls` that uses `__slots__`, see `slots.slotted`.
+        frozen : build an immutable variant of `cls` that uses `__slots__`.
+    """
+    if slots or frozen:
+        cls = slotted(cls, frozen)
+
+    return compile_plan(cls).build(json)
+
+
+def validate(cls: type, data: dict, first=False) -> List[str]:
+    """Return the error messages that `build(cls, data)` would raise, without building objects.
+    Note that the constructors and `__post_init__` methods of classes with fields are not called.
+
+    Parameters
+    ----------
+        first : stop at the first invalid field of each object, rather than collecting all errors.
+    """
+    error = compile_plan(cls).check(data, first=first)
+    if error is None:
+        return []
+
+    return flatten(error)
+
+
+def build_many(cls: type, records: Iterable[dict], processes: int = None,
+               chunksize=1000) -> Tuple[list, Dict[int, List[str]]]:
+    """Initialize `cls` for each record.
+    Invalid records are skipped, such that all records are processed.
+
+    Usage
+    -----
+
+    .. code-block:: python
+
+        users, errors = build_many(User, records)
+        for i, messages in errors.items():
+            print(f'record {i}:', *messages)
+
+    Parameters
+    ----------
+        processes : the number of worker processes, see `build_iter`.
+        chunksize : the number of records per task of a worker.
+
+    Returns
+    -------
+        results : the objects of the valid records, in order.
+        errors : the error messages of each invalid record, by record index.
+    """
+    results = []
+    errors = {}
+    for i, result in enumerate(build_iter(cls, records, processes, chunksize)):
+        if isinstance(result, SpecError):
+            errors[i] = flatten(result)
+        else:
+            results.append(result)
+
+    return results, errors
+
+
+def build_iter(cls: type, records: Iterable[dict], processes: int = None,
+               chunksize=1000) -> Iterator[object]:
+    """Yield an object for each record, in order.
+    The error (e.g. BuildError or BuildErrors) of an invalid record is yielded instead of raised.
+
+    Usage
+    -----
+
+    .. code-block:: python
+
+        for user in build_iter(User, records, processes=4):
+            if isinstance(user, SpecError):
+                ...
+
+    Parameters
+    ----------
+        processes : the number of worker processes. Use the current process by default.
+            Each worker compiles the plan of `cls` once, when it is started.
+            Note that `cls` must be defined at module level such that it can be pickled.
+        chunksize : the number of records per task of a worker.
+            At most two tasks per worker are pending, such that `records` can be a generator.
+    """
+    chunks = iter_chunks(records, chunksize)
+
+    if processes is None:
+        plan = compile_plan(cls)
+        for chunk in chunks:
+            yield from build_chunk(chunk, plan)
+        return
+
+    with mp.Pool(processes, initializer=init_worker, initargs=(cls,)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            if len(pending) >= 2 * processes:
+                yield from pending.popleft().get()
+
+            pending.append(pool.apply_async(build_chunk, (chunk,)))
+
+        while pending:
+            yield from pending.popleft().get()
+
+
+def init_worker(cls: type):
+    global worker_plan
+    worker_plan = compile_plan(cls)
+
+
+def build_chunk(records: List[dict], plan: Plan = None) -> list:
+    """Return the object or error of each record, see `build_iter`.
+    Use the plan of the current worker by default.
     """
-    return JSONFactory(cls).build(json)
+    if plan is None:
+        plan = worker_plan
+
+    results = []
+    for record in records:
+        try:
+            results.append(plan.build(record))
+        except SpecError as e:
+            results.append(e)
+
+    return results
+
+
+def iter_chunks(items: Iterable, size: int) -> Iterator[list]:
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+
+        yield chunk
 
 
 class Factory(ABC):
@@ -214,7 +356,8 @@ class JSONFactory(Factory):
                 pass
 
         if is_Dict(self.cls):
-            return self.build_generic_Dict(fields)
+            # the values have been built by build_fields
+            return fields
 
         if is_List(self.cls):
             return list(fields.values())
@@ -234,20 +377,6 @@ class JSONFactory(Factory):
 
         return instance
 
-    def build_generic_Dict(self, fields):
-        inner_cls = self.cls.__args__[1]
-        factory = JSONFactory(inner_cls, self.parent_keys)
-        result = {}
-        for k, v in fields.items():
-            try:
-                result[k] = factory.build(v)
-            except BuildErrors as e:
-                logging.debug(
-                    f'build_list: factory({inner_cls}).build({v}) failed: {e}')
-                raise
-
-        return result
-
     def build_list(self, items: list) -> list:
         assert len(self.cls.__args__) == 1
 
@@ -1,9 +1,11 @@
 """Generate a OAS/Swagger component
 See: [OAS](https://swagger.io/specification/)
 """
-from typing import _GenericAlias
+from copy import deepcopy
+from dataclasses import fields, is_dataclass
+from typing import Union, get_type_hints
 
-from mash.util import is_enum
+from mash.util import infer_inner_cls, is_Dict, is_List, is_enum
 
 
 # OAS basic types, excluding containers  (e.g. dict, list)
@@ -63,14 +65,14 @@ class OAS(dict):
     """
 
     def __init__(self, *args, **kwds):
-        super().__init__(template.copy())
+        super().__init__(deepcopy(template))
 
     @property
     def components(self):
         return self[K.components][K.schemas]
 
     def extend(self, obj: object):
-        """Generate OAS/Swagger components from a class
+        """Generate OAS/Swagger components from a class or an instance of a class
         See: [OAS](https://swagger.io/specification/)
         E.g.
 
@@ -84,57 +86,70 @@ class OAS(dict):
                                 type: integer
                             name:
                                 type: string
+
+        The schema is derived from type annotations, such that each type is only visited once.
+        """
+        cls = obj if isinstance(obj, type) else type(obj)
+        self.add_component(cls)
+
+    def add_component(self, cls: type) -> dict:
+        """Add a component for `cls` and the types of its fields, unless it exists.
+        Return a reference to the component.
+        """
+        name = cls.__name__
+        if name not in self.components:
+            # add the component before its fields, such that cycles end in a reference
+            component = oas_component(cls)
+            self.components[name] = component
+
+            if K.props in component:
+                for k, t in field_types(cls).items():
+                    component[K.props][k] = self.schema(t)
+
+        return oas_ref(name)
+
+    def schema(self, t) -> dict:
+        """Return an inline schema for basic types and enums, or otherwise a reference.
+        """
+        if t in basic_value_type:
+            return {'type': basic_value_type[t]}
+
+        if is_enum(t):
+            # use strings rather than enum.value
+            return {'type': basic_value_type[str],
+                    'enum': [e.name for e in t]}
+
+        if is_Dict(t):
+            return {'type': 'object',
+                    'additionalProperties': self.schema(infer_inner_cls(t))}
+
+        if is_List(t):
+            return {'type': 'array',
+                    'items': self.schema(infer_inner_cls(t))}
+
+        if getattr(t, '__origin__', None) is Union:
+            return self.union_schema(t)
+
+        if isinstance(t, type):
+            return self.add_component(t)
+
+        # e.g. typing.Any
+        return {}
+
+    def union_schema(self, t) -> dict:
+        """Return the schema of the inner type of `Optional`, or the alternatives of a `Union`.
         """
-        t = type(obj).__name__
-        if t not in self.components:
-            self.components[t] = oas_component(obj)
-
-        if not hasattr(obj, '__annotations__'):
-            return
-
-        for k in obj.__annotations__:
-            try:
-                v = getattr(obj, k)
-            except AttributeError as e:
-                e
-            v = getattr(obj, k)
-            item_type = infer_oas_type(v)
-
-            if is_enum(type(v)):
-                # use strings rather than enum.value
-                item_type = infer_oas_type('')
-                values = [e.name for e in type(v)]
-                self.components[t][K.props][k] = {
-                    'type': item_type,
-                    'enum': values
-                }
-
-            elif type(v) in basic_value_type.keys():
-                self.components[t][K.props][k] = {'type': item_type}
-
-            elif isinstance(v, _GenericAlias) or isinstance(v, list):
-                for child in v:
-                    self.add_array(t, k, child)
-
-            elif item_type == 'dict':
-                for child in v.values():
-                    self.add_array(t, k, child)
-            else:
-                self.extend(v)
-                self.components[t][K.props][k] = oas_ref(item_type)
-
-    def add_array(self, parent_name: str, child_name: str, child):
-        item_type = infer_oas_type(child)
-        if not has_known_type(child):
-            self.extend(child)
-            item = oas_ref(item_type)
+        args = [arg for arg in t.__args__ if arg is not type(None)]
+        nullable = len(args) < len(t.__args__)
+        if len(args) == 1:
+            result = self.schema(args[0])
         else:
-            item = {'type': item_type}
+            result = {'oneOf': [self.schema(arg) for arg in args]}
+
+        if nullable and '$ref' not in result:
+            result['nullable'] = True
 
-        self.components[parent_name][K.props][child_name] = {
-            'type': 'array',
-                    'items': item
-        }
+        return result
 
 
 def oas_component(obj, doc=''):
@@ -152,6 +167,20 @@ def oas_component(obj, doc=''):
     return result
 
 
+def field_types(cls: type) -> dict:
+    """Return the type annotations of the fields of `cls`, including forward references.
+    """
+    try:
+        hints = get_type_hints(cls)
+    except (NameError, TypeError):
+        hints = getattr(cls, '__annotations__', {})
+
+    if is_dataclass(cls):
+        return {f.name: hints.get(f.name, f.type) for f in fields(cls)}
+
+    return hints
+
+
 def oas_ref(item=''):
     return {'$ref': f'#/components/schemas/{item}'}
 
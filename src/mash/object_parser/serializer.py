@@ -0,0 +1,206 @@
+"""Serialize objects to json-like data, such that they can be built again.
+
+Serialization is the inverse of `build`: enums are represented by their names
+and nested objects by dicts. Each class is analysed once, similar to `compiler.compile_plan`.
+Objects are not copied, in contrast to `dataclasses.asdict`.
+
+Usage
+-----
+
+.. code-block:: python
+
+    text = dumps(document)
+    document = loads(text, Document)
+
+    # include class names, such that the class can be looked up in a registry
+    register_dataclass(Document)
+    text = dumps(document, tagged=True)
+    document = loads(text)
+"""
+from dataclasses import fields, is_dataclass
+from enum import Enum
+from typing import _GenericAlias
+import json
+
+from mash.object_parser.compiler import compile_plan
+from mash.util import Encoder, dataclass_name, dataclass_registry, infer_inner_cls, is_Dict, is_enum, is_List
+
+TAG = Encoder._dataclass_key
+
+# types that are serialized as-is
+basic_types = (bool, float, int, str, type(None))
+
+serializers = {}
+
+
+def serialize(obj, tagged=False):
+    """Return a json-like representation of `obj`.
+
+    Parameters
+    ----------
+        tagged : add the class name to each object, see `util.Encoder`.
+    """
+    return serialize_value(obj, tagged)
+
+
+def deserialize(data, cls: type = None):
+    """Initialize `cls` with fields from `data`, see `build`.
+    If `cls` is omitted, then it is looked up in the registry by the tag of `data`.
+    This requires the class to be registered, see `util.register_dataclass`.
+    """
+    if cls is None:
+        try:
+            cls = dataclass_registry[data[TAG]]
+        except (KeyError, TypeError) as e:
+            raise TypeError(f'Cannot deserialize object: Unknown class {e}') from e
+
+    if isinstance(data, dict) and TAG in data:
+        data = remove_tags(data)
+
+    return compile_plan(cls).build(data)
+
+
+def dumps(obj, tagged=False, as_bytes=False):
+    """Serialize `obj` to a JSON string.
+    If `as_bytes` is True, then return bytes, using the optional dependency orjson if it is installed.
+    """
+    data = serialize(obj, tagged)
+    if as_bytes:
+        try:
+            # optional dependency
+            import orjson
+            return orjson.dumps(data)
+        except ImportError:
+            return json.dumps(data, separators=(',', ':')).encode()
+
+    return json.dumps(data)
+
+
+def loads(text, cls: type = None):
+    """Deserialize a JSON string or bytes, see `deserialize`.
+    """
+    return deserialize(json.loads(text), cls)
+
+
+def compile_serializer(cls: type, tagged=False) -> 'Serializer':
+    """Return the (cached) serializer of the dataclass `cls`.
+    """
+    key = (cls, tagged)
+    try:
+        return serializers[key]
+    except KeyError:
+        pass
+
+    serializer = Serializer(cls, tagged)
+    serializers[key] = serializer
+    return serializer
+
+
+class Serializer:
+    def __init__(self, cls: type, tagged=False):
+        """Analyse the fields of the dataclass `cls` once.
+        Note that the encoders of inner types are compiled on first use,
+        such that classes can refer to themselves.
+        """
+        self.cls = cls
+        self.tagged = tagged
+        self.name = dataclass_name(cls)
+        self.fields = [(f.name, f.type) for f in fields(cls)]
+        self._encoders = None
+
+    @property
+    def encoders(self) -> list:
+        if self._encoders is None:
+            self._encoders = [(name, encoder(t, self.tagged))
+                              for name, t in self.fields]
+        return self._encoders
+
+    def serialize(self, obj) -> dict:
+        result = {}
+        for name, encode in self.encoders:
+            value = getattr(obj, name)
+            result[name] = value if encode is None else encode(value)
+
+        if self.tagged:
+            result[TAG] = self.name
+
+        return result
+
+
+def encoder(t, tagged: bool):
+    """Return a function that serializes values of type `t`, or None if values can be used as-is.
+    """
+    if t in basic_types:
+        return None
+
+    if isinstance(t, type) and is_dataclass(t):
+        serializer = compile_serializer(t, tagged)
+
+        def encode_object(value):
+            if type(value) is t:
+                return serializer.serialize(value)
+            return serialize_value(value, tagged)
+
+        return encode_object
+
+    if is_enum(t):
+        return encode_enum
+
+    if is_List(t):
+        encode = encoder(infer_inner_cls(t), tagged)
+        if encode is None:
+            return list
+
+        return lambda values: [encode(v) for v in values]
+
+    if is_Dict(t):
+        encode = encoder(infer_inner_cls(t), tagged)
+        if encode is None:
+            return dict
+
+        return lambda values: {k: encode(v) for k, v in values.items()}
+
+    if isinstance(t, type) and issubclass(t, basic_types) and not issubclass(t, Enum):
+        # e.g. a subclass of str
+        return None
+
+    return lambda value: serialize_value(value, tagged)
+
+
+def encode_enum(value):
+    # the default value of a field may not be an instance of the enum
+    return value.name if isinstance(value, Enum) else value
+
+
+def serialize_value(value, tagged=False):
+    """Serialize a value of an unknown type.
+    """
+    if isinstance(value, basic_types):
+        return value.name if isinstance(value, Enum) else value
+
+    if isinstance(value, Enum):
+        return value.name
+
+    if is_dataclass(value) and not isinstance(value, type):
+        return compile_serializer(type(value), tagged).serialize(value)
+
+    if isinstance(value, (list, tuple)):
+        return [serialize_value(v, tagged) for v in value]
+
+    if isinstance(value, dict):
+        return {k: serialize_value(v, tagged) for k, v in value.items()}
+
+    if isinstance(value, _GenericAlias):
+        raise TypeError(f'Cannot serialize type {value}')
+
+    return value
+
+
+def remove_tags(data):
+    if isinstance(data, list):
+        return [remove_tags(item) for item in data]
+
+    if isinstance(data, dict):
+        return {k: remove_tags(v) for k, v in data.items() if k != TAG}
+
+    return data
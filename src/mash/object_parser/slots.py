@@ -0,0 +1,98 @@
+"""Generate memory-efficient variants of dataclasses.
+
+Instances of a slotted class have no `__dict__`, which reduces the memory per instance.
+Variants are generated recursively, such that nested dataclasses are slotted as well.
+
+Usage
+-----
+
+.. code-block:: python
+
+    documents = [build(Document, item, slots=True) for item in items]
+
+    @slotted
+    @dataclass
+    class Point:
+        x: int
+        y: int = 0
+"""
+from dataclasses import dataclass, field, fields, is_dataclass
+from typing import _GenericAlias
+
+from mash.util import is_Dict_or_List
+
+# attributes that are generated by the dataclass decorator
+generated = {'__init__', '__setattr__', '__delattr__', '__hash__', '__match_args__',
+             '__dataclass_fields__', '__dataclass_params__', '__dict__', '__weakref__'}
+
+variants = {}
+
+
+def slotted(cls: type, frozen=False) -> type:
+    """Return a variant of the dataclass `cls` that uses `__slots__`.
+    Dataclasses in the type annotations of `cls` are replaced by their variants.
+
+    Note that variants are standalone classes: instances are not instances of `cls`
+    or its base classes, and they cannot be pickled.
+
+    Parameters
+    ----------
+        frozen : make instances immutable.
+    """
+    key = (cls, frozen)
+    if key not in variants:
+        # refer to the original class in case of a cycle
+        variants[key] = cls
+        try:
+            variants[key] = new_variant(cls, frozen)
+        except TypeError:
+            del variants[key]
+            raise
+
+    return variants[key]
+
+
+def new_variant(cls: type, frozen: bool) -> type:
+    names = [f.name for f in fields(cls)]
+
+    namespace = {}
+    for base in reversed(cls.__mro__[:-1]):
+        for k, v in base.__dict__.items():
+            if k not in generated and k not in names:
+                namespace[k] = v
+
+    namespace['__qualname__'] = cls.__qualname__
+    namespace['__annotations__'] = {f.name: variant_type(f.type, frozen)
+                                    for f in fields(cls)}
+    for f in fields(cls):
+        namespace[f.name] = field(default=f.default,
+                                  default_factory=f.default_factory,
+                                  init=f.init, repr=f.repr, hash=f.hash,
+                                  compare=f.compare, metadata=f.metadata)
+
+    params = cls.__dataclass_params__
+    decorator = dataclass(init=params.init, repr=params.repr, eq=params.eq,
+                          order=params.order, unsafe_hash=params.unsafe_hash,
+                          frozen=frozen or params.frozen)
+    variant = decorator(type(cls.__name__, (), namespace))
+
+    # recreate the class, because slots cannot be added to an existing class
+    namespace = dict(variant.__dict__)
+    for name in names:
+        # defaults are stored in __init__ and in __dataclass_fields__
+        namespace.pop(name, None)
+
+    namespace.pop('__dict__', None)
+    namespace.pop('__weakref__', None)
+    namespace['__slots__'] = tuple(names)
+    return type(variant)(variant.__name__, variant.__bases__, namespace)
+
+
+def variant_type(t, frozen: bool):
+    if isinstance(t, type) and is_dataclass(t):
+        return slotted(t, frozen)
+
+    if isinstance(t, _GenericAlias) and is_Dict_or_List(t):
+        return t.copy_with(tuple(variant_type(arg, frozen) for arg in t.__args__))
+
+    return t
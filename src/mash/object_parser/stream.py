@@ -0,0 +1,207 @@
+"""Decode large JSON documents incrementally.
+
+Only a single record and a chunk of the input are kept in memory.
+Records are selected by a path, e.g.
+
+- `[*]` selects each item of a top-level array.
+- `rows[*]` selects each item of the array `rows` of a top-level object.
+- `rows[*].row` selects the field `row` of each of these items.
+
+Usage
+-----
+
+.. code-block:: python
+
+    with open('export.json', 'rb') as f:
+        for row in build_stream(Row, f, 'rows[*]'):
+            ...
+"""
+from typing import Iterator, List
+import codecs
+import json
+import os
+import re
+
+from mash.object_parser.compiler import compile_plan
+
+WHITESPACE = re.compile(r'\s*')
+BRACKETS = re.compile(r'["\[\]{}]')
+PATH_SEGMENT = re.compile(r'\[\*\]|[^.\[\]]+')
+NUMBER_CHARS = '0123456789+-.eE'
+
+
+def build_stream(cls: type, file, path='[*]', chunk_size=2**16) -> Iterator[object]:
+    """Initialize `cls` for each record in `file`, see `iter_json`.
+    """
+    plan = compile_plan(cls)
+    for record in iter_json(file, path, chunk_size):
+        yield plan.build(record)
+
+
+def iter_json(file, path='[*]', chunk_size=2**16) -> Iterator[object]:
+    """Yield the values at `path` in a JSON document.
+
+    Parameters
+    ----------
+        file : a filename or a file-like object, in either text or binary mode.
+        path : a str such as `rows[*]`, or a list of keys such as `['rows', '*']`.
+        chunk_size : the number of characters (or bytes) that are read at once.
+    """
+    if isinstance(path, str):
+        path = parse_path(path)
+
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            yield from JSONStream(f, chunk_size).select(path)
+    else:
+        yield from JSONStream(file, chunk_size).select(path)
+
+
+def parse_path(path: str) -> List[str]:
+    """Split a path such as `rows[*].row` into keys, where `*` selects each item of an array.
+    """
+    segments = PATH_SEGMENT.findall(path)
+    if ''.join(segments) != path.replace('.', ''):
+        raise ValueError(f'Invalid path: {path}')
+
+    return ['*' if segment == '[*]' else segment for segment in segments]
+
+
+class JSONStream:
+    def __init__(self, file, chunk_size=2**16):
+        """A buffered reader of JSON values.
+        """
+        self.file = file
+        self.chunk_size = chunk_size
+        self.text = codecs.getincrementaldecoder('utf-8')()
+        self.decoder = json.JSONDecoder()
+
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def select(self, path: List[str]) -> Iterator[object]:
+        """Yield the values at `path`, while skipping all other values.
+        """
+        if not path:
+            yield self.decode()
+            return
+
+        key, path = path[0], path[1:]
+        if key == '*':
+            self.expect('[')
+            if self.peek() == ']':
+                self.pos += 1
+                return
+
+            while True:
+                yield from self.select(path)
+                if self.expect(',]') == ']':
+                    return
+
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+
+        while True:
+            k = self.decode()
+            self.expect(':')
+            if k == key:
+                yield from self.select(path)
+            else:
+                self.skip()
+
+            if self.expect(',}') == '}':
+                return
+
+    def read(self, size: int = None) -> bool:
+        """Append the next chunk to the buffer and discard the processed part.
+        Return False at the end of the file.
+        """
+        if self.eof:
+            return False
+
+        chunk = self.file.read(size or self.chunk_size)
+        if isinstance(chunk, bytes):
+            chunk = self.text.decode(chunk, final=not chunk)
+
+        if not chunk:
+            self.eof = True
+            return False
+
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, or '' at the end of the file.
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+
+            if not self.read():
+                return ''
+
+    def expect(self, chars: str) -> str:
+        c = self.peek()
+        if not c or c not in chars:
+            expected = ' or '.join(f"'{char}'" for char in chars)
+            raise json.JSONDecodeError(f'Expecting {expected}', self.buffer, self.pos)
+
+        self.pos += 1
+        return c
+
+    def decode(self) -> object:
+        """Decode the next value.
+        """
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+
+                # a number may continue in the next chunk
+                if self.eof or (end < len(self.buffer) and self.buffer[end] not in NUMBER_CHARS):
+                    self.pos = end
+                    return value
+
+            except json.JSONDecodeError:
+                # the value may be incomplete
+                if self.eof:
+                    raise
+
+            # increase the chunk size to avoid decoding large values many times
+            self.read(size)
+            size *= 2
+
+    def skip(self):
+        """Skip the next value without decoding its items.
+        """
+        c = self.peek()
+        if not c or c not in '[{':
+            self.decode()
+            return
+
+        depth = 0
+        while True:
+            match = BRACKETS.search(self.buffer, self.pos)
+            if match is None:
+                self.pos = len(self.buffer)
+                if not self.read():
+                    raise json.JSONDecodeError('Unterminated value', self.buffer, self.pos)
+                continue
+
+            self.pos = match.start()
+            c = match.group()
+            if c == '"':
+                # strings can contain brackets
+                self.decode()
+                continue
+
+            self.pos += 1
+            depth += 1 if c in '[{' else -1
+            if depth == 0:
+                return
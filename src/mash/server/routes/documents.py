@@ -7,7 +7,7 @@ import os
 
 
 from mash.server.domain.css import Document, generate_style
-from mash.object_parser.errors import BuildError, BuildErrors, to_string
+from mash.object_parser.errors import SpecError, flatten
 from mash.object_parser import build
 from mash.server.repository import UPLOAD_FOLDER
 from mash.server.routes.default import basepath
@@ -64,11 +64,8 @@ def init(app):
         # WARNING: this exposes internal classes
         try:
             obj = build(Document, data)
-        except BuildError as e:
-            debug(f'POST {path}\n' + e.args[0])
-            return f'Invalid input: {e.args[0]}', HTTPStatus.BAD_REQUEST
-        except BuildErrors as e:
-            errors = to_string(e)
+        except SpecError as e:
+            errors = '\n'.join(flatten(e))
             debug(f'POST {path}\n' + errors)
             return f'Invalid input: {errors}', HTTPStatus.BAD_REQUEST
 
@@ -3,7 +3,7 @@ from logging import debug
 from flask import request
 from http import HTTPStatus
 
-from mash.object_parser.errors import BuildError, BuildErrors, to_string
+from mash.object_parser.errors import SpecError, flatten
 from mash.object_parser import build
 from mash.server.domain.user import RawUser
 from mash.server.repository import Repository, create_user
@@ -25,11 +25,8 @@ def init(app):
             # WARNING: this exposes internal classes
             try:
                 user = build(RawUser, data)
-            except BuildError as e:
-                debug('POST /users\n' + e.args[0])
-                return f'Invalid input: {e.args[0]}', HTTPStatus.BAD_REQUEST
-            except BuildErrors as e:
-                errors = to_string(e)
+            except SpecError as e:
+                errors = '\n'.join(flatten(e))
                 debug('POST /users\n' + errors)
                 return f'Invalid input: {errors}', HTTPStatus.BAD_REQUEST
 
@@ -19,8 +19,11 @@ The internal structure is decoupled.
     - repository.py: Persistency layer
 
 """
+from contextlib import contextmanager
 from flask import Flask
+from werkzeug.serving import make_server
 import os
+import threading
 
 from mash.server.routes import default, documents, users
 from mash.server.repository import UPLOAD_FOLDER, Repository
@@ -46,6 +49,21 @@ def init_routes(app):
     users.init(app)
 
 
+@contextmanager
+def serve_in_background(host='127.0.0.1', port=0):
+    """Run a threaded server in a daemon thread and yield its base url.
+    Use port=0 to select any free port.
+    """
+    server = make_server(host, port, init(), threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://{host}:{server.server_port}'
+    finally:
+        server.shutdown()
+        thread.join()
+
+
 if __name__ == "__main__":
     app = init()
     app.run()
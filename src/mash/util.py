@@ -3,7 +3,7 @@ from json import JSONEncoder
 import re
 import shlex
 from braceexpand import braceexpand, UnbalancedBracesError
-from dataclasses import asdict, dataclass, is_dataclass
+from dataclasses import dataclass, fields as dataclass_fields, is_dataclass
 from enum import Enum
 from functools import partial
 from itertools import accumulate, dropwhile, takewhile
@@ -505,24 +505,53 @@ def use_recursion_limit(limit=100):
         sys.setrecursionlimit(original)
 
 
+# dataclasses that can be deserialized by name, see `dataclass_name`
+dataclass_registry = {}
+
+
+def register_dataclass(cls: type) -> type:
+    """Register a dataclass such that it can be deserialized by `deserialize_dataclass`.
+    This can be used as a class decorator.
+
+    Registration is required for deserialization, also in other processes.
+    Classes are not registered when they are serialized.
+    """
+    key = dataclass_name(cls)
+    if dataclass_registry.get(key, cls) is not cls:
+        raise ValueError(f'Conflicting dataclass name: {key}')
+
+    dataclass_registry[key] = cls
+    return cls
+
+
+def dataclass_name(cls: type) -> str:
+    """Return the name of a dataclass that is used to serialize instances.
+    """
+    return f'{cls.__module__}.{cls.__qualname__}'
+
+
 class Encoder(JSONEncoder):
     _dataclass_key = '_dataclass_key'
 
     def default(self, obj):
         if is_dataclass(obj):
-            obj = self.serialize_dataclass(obj)
+            return self.serialize_dataclass(obj)
 
         return super().default(obj)
 
     def serialize_dataclass(self, obj: dataclass):
+        """Return the fields of a dataclass and its class name.
+        Nested dataclasses are serialized by the encoder itself, hence the fields are not copied.
+        Note that classes must be registered to be deserialized, see `register_dataclass`.
+        """
         if not is_dataclass(obj):
             return obj
 
-        fields = asdict(obj)
+        fields = {f.name: getattr(obj, f.name) for f in dataclass_fields(obj)}
         if self._dataclass_key in fields:
             raise TypeError(f'Conflicting key: {self._dataclass_key}')
 
-        fields[self._dataclass_key] = type(obj).__name__
+        fields[self._dataclass_key] = dataclass_name(type(obj))
         return fields
 
 
@@ -531,15 +560,15 @@ def deserialize_dataclasses(obj: dict):
         return [deserialize_dataclasses(item) for item in obj]
 
     elif isinstance(obj, tuple):
-        return (deserialize_dataclasses(item) for item in obj)
+        return tuple(deserialize_dataclasses(item) for item in obj)
 
     elif hasattr(obj, 'items'):
-        if Encoder._dataclass_key in obj:
-            return deserialize_dataclass(obj)
-
         for k, v in obj.items():
             obj[k] = deserialize_dataclasses(v)
 
+        if Encoder._dataclass_key in obj:
+            return deserialize_dataclass(obj)
+
     return obj
 
 
@@ -548,12 +577,12 @@ def deserialize_dataclass(obj: dict):
     del obj[Encoder._dataclass_key]
 
     try:
-        cls = locals()[key]
+        cls = dataclass_registry[key]
     except KeyError as e:
         raise TypeError(
             f'Cannot deserialize object: Unknown class {key}') from e
 
-    return cls.fromdict(obj)
+    return cls(**obj)
 
 ################################################################################
 # Pure functions
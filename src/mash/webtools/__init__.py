@@ -4,5 +4,6 @@
 
     - html_table: Converts Python objects to HTML 
     - parallel_requests: Load testing
+    - scenario: Weighted request mixes for load tests
     - verify_server: Verify connectivity to a URL
 """
@@ -2,6 +2,7 @@
 """
 from dataclasses import dataclass
 from typing import Dict, List
+import functools
 import mistletoe
 
 from mash.object_parser.factory import build
@@ -10,13 +11,31 @@ from mash.object_parser.factory import build
 HeadingKey = str
 
 
+@functools.lru_cache(maxsize=2**12)
+def render(text: str) -> str:
+    """Render markdown to HTML. Identical cells are rendered once.
+    """
+    return mistletoe.markdown(text)
+
+
 class Markdown(str):
     @staticmethod
     def parse_value(value):
-        v = mistletoe.markdown(value)
+        if isinstance(value, _Rendered):
+            # the value has been rendered already, see `render_cells`
+            return value
+
+        if isinstance(value, str):
+            return render(value)
+
         return mistletoe.markdown(value)
 
 
+class _Rendered(Markdown):
+    """HTML that has been rendered from markdown.
+    """
+
+
 @dataclass
 class Row:
     row: Dict[HeadingKey, List[Markdown]]
@@ -45,7 +64,48 @@ class HTMLTableData:
 
 
 def parse_json(json: dict):
-    return build(HTMLTableData, json)
+    return build(HTMLTableData, render_cells(json))
+
+
+def render_cells(json: dict) -> dict:
+    """Return a copy of `json` in which the text of each cell is rendered.
+    Each distinct text is rendered once, regardless of the size of the cache of `render`.
+    Values that are not in the expected format are left as-is, such that `build` can report them.
+    """
+    rendered = {}
+
+    def render_cell(text):
+        if not isinstance(text, str):
+            return text
+
+        if text not in rendered:
+            rendered[text] = _Rendered(render(text))
+
+        return rendered[text]
+
+    if not isinstance(json, dict):
+        return json
+
+    json = dict(json)
+    parameters = json.get('parameters')
+    if isinstance(parameters, dict) and isinstance(parameters.get('headings'), dict):
+        headings = {k: render_cell(v) for k, v in parameters['headings'].items()}
+        json['parameters'] = {**parameters, 'headings': headings}
+
+    rows = json.get('rows')
+    if isinstance(rows, list):
+        json['rows'] = [render_row(row, render_cell) for row in rows]
+
+    return json
+
+
+def render_row(row, render_cell) -> dict:
+    if not isinstance(row, dict) or not isinstance(row.get('row'), dict):
+        return row
+
+    cells = {k: [render_cell(text) for text in v] if isinstance(v, list) else v
+             for k, v in row['row'].items()}
+    return {**row, 'row': cells}
 
 
 example_yaml_data = """
@@ -0,0 +1,319 @@
+"""Metrics for load tests and pipelines.
+
+Errors are counted by structured keys rather than by message, such that no
+string formatting is required for each failure.
+Results are aggregated per time interval, and can be exported to CSV or JSON lines.
+
+The workers of a pipeline record counters and a histogram of service times,
+which are aggregated per stage.
+"""
+from collections import Counter, defaultdict, namedtuple
+from typing import Dict, List, Sequence, TextIO
+import csv
+import json
+import multiprocessing as mp
+import numpy as np
+import time
+
+ErrorKey = namedtuple('ErrorKey', ['type', 'errno', 'status'])
+
+
+def error_key(error: Exception) -> ErrorKey:
+    """Classify an error by its type, OS error-number and HTTP status.
+    E.g. `ClientConnectorError` has an errno and `ClientResponseError` a status.
+    """
+    return ErrorKey(type(error).__name__,
+                    getattr(error, 'errno', None),
+                    getattr(error, 'status', None))
+
+
+class ErrorCounter:
+    """Count errors per `ErrorKey` and per time interval.
+
+    At most one message is sampled per key and per interval, up to a total of
+    `max_samples` messages per key.
+    """
+
+    def __init__(self, max_samples=3, interval=1., t0: float = None):
+        self.max_samples = max_samples
+        self.interval = interval
+        self.t0 = time.perf_counter() if t0 is None else t0
+
+        self.counts = Counter()
+        self.samples = {}
+        self.timeline = Counter()
+        self._last_sample = {}
+
+    def add(self, error: Exception, t: float = None):
+        """Register an error that occurred at time t (perf_counter).
+        """
+        key = error_key(error)
+        self.counts[key] += 1
+
+        i = self.bucket(t)
+        self.timeline[i] += 1
+
+        if self._last_sample.get(key) == i:
+            return
+
+        samples = self.samples.setdefault(key, [])
+        if len(samples) < self.max_samples:
+            samples.append(str(error))
+            self._last_sample[key] = i
+
+    def extend(self, errors, t: float = None):
+        if t is None:
+            t = time.perf_counter()
+
+        for error in errors:
+            self.add(error, t)
+
+    def bucket(self, t: float = None) -> int:
+        if t is None:
+            t = time.perf_counter()
+        return int((t - self.t0) // self.interval)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def error_rate(self, successes: Counter) -> dict:
+        """Return the fraction of failures per interval.
+
+        Parameters
+        ----------
+            successes : the number of successful calls per bucket
+        """
+        buckets = set(successes) | set(self.timeline)
+        rates = {}
+        for i in sorted(buckets):
+            n = successes[i] + self.timeline[i]
+            rates[i] = self.timeline[i] / n if n else 0.
+        return rates
+
+    def show(self, successes: Counter = None):
+        for key, n in self.counts.most_common():
+            samples = '; '.join(self.samples.get(key, []))
+            print(f'> {key.type} (errno: {key.errno}, status: {key.status}) '
+                  f'\tN: {n} \te.g. {samples}')
+
+        if successes is None:
+            return
+
+        for i, rate in self.error_rate(successes).items():
+            t = i * self.interval
+            print(f'> t: {t:.1f} s \terrors: {self.timeline[i]} '
+                  f'\terror rate: {rate * 100:.1f} %')
+
+
+class TimeSeries:
+    """Aggregate the latency of calls and the number of errors per time interval.
+    """
+    fields = ['t', 'N', 'errors', 'tps', 'error_rate',
+              'mean', 'p50', 'p90', 'p99']
+
+    def __init__(self, interval=1., t0: float = None):
+        self.interval = interval
+        self.t0 = time.perf_counter() if t0 is None else t0
+
+        self.latencies: Dict[int, List[float]] = defaultdict(list)
+        self.errors = Counter()
+        self.n_written = 0
+
+    def add(self, times: List[float], n_errors=0, t: float = None):
+        i = self.bucket(t)
+        self.latencies[i].extend(times)
+        self.errors[i] += n_errors
+
+    def bucket(self, t: float = None) -> int:
+        if t is None:
+            t = time.perf_counter()
+        return int((t - self.t0) // self.interval)
+
+    @property
+    def successes(self) -> Counter:
+        return Counter({i: len(v) for i, v in self.latencies.items()})
+
+    @property
+    def n_buckets(self) -> int:
+        return max(list(self.latencies) + list(self.errors), default=-1) + 1
+
+    def row(self, i: int) -> dict:
+        times = self.latencies.get(i, [])
+        n = len(times)
+        total = n + self.errors[i]
+        row = {'t': i * self.interval,
+               'N': n,
+               'errors': self.errors[i],
+               'tps': n / self.interval,
+               'error_rate': self.errors[i] / total if total else 0.}
+
+        row.update(latency_statistics(times))
+        return row
+
+    def rows(self, start=0, end: int = None):
+        if end is None:
+            end = self.n_buckets
+
+        for i in range(start, end):
+            yield self.row(i)
+
+    def write(self, f: TextIO, format='csv', final=False):
+        """Write all completed intervals that have not been written yet.
+        Use `final=True` to include the current interval.
+        """
+        end = self.n_buckets if final else min(self.bucket(), self.n_buckets)
+        rows = list(self.rows(self.n_written, end))
+        self.n_written = max(self.n_written, end)
+
+        if format == 'csv':
+            writer = csv.DictWriter(f, self.fields)
+            if f.tell() == 0:
+                writer.writeheader()
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+
+        f.flush()
+
+
+def latency_statistics(times: List[float]) -> dict:
+    if not times:
+        return {'mean': None, 'p50': None, 'p90': None, 'p99': None}
+
+    p50, p90, p99 = np.percentile(times, [50, 90, 99])
+    return {'mean': float(np.mean(times)),
+            'p50': float(p50),
+            'p90': float(p90),
+            'p99': float(p99)}
+
+
+def summary(status: Counter, times: List[float], errors: ErrorCounter,
+            duration: float) -> dict:
+    """Return an overview of a complete run.
+    """
+    n = len(times)
+    total = n + errors.total
+    result = {'N': n,
+              'errors': errors.total,
+              'duration': duration,
+              'tps': n / duration if duration else 0.,
+              'error_rate': errors.total / total if total else 0.,
+              'status': {str(k): status[k] for k in sorted(status, key=str)},
+              'exceptions': {'/'.join(str(v) for v in k): v
+                             for k, v in errors.counts.items()}}
+
+    result.update(latency_statistics(times))
+    if times:
+        result['max'] = float(np.max(times))
+
+    return result
+
+
+def output_format(filename: str) -> str:
+    """Infer the format of a time series file: either csv or jsonl.
+    """
+    if filename.endswith('.csv'):
+        return 'csv'
+    return 'jsonl'
+
+
+class WorkerMetrics:
+    """Counters of a single pipeline worker.
+
+    Values can be stored in shared memory, such that they can be read by a
+    different process without sending messages.
+    Service times are counted in buckets, where bucket i contains durations of
+    less than 2^i microseconds.
+    """
+    fields = ['items_in', 'items_out', 'busy', 'idle', 'blocked',
+              'errors', 'failures']
+    n_buckets = 32
+
+    ITEMS_IN, ITEMS_OUT, BUSY, IDLE, BLOCKED, ERRORS, FAILURES = range(len(fields))
+    size = len(fields) + n_buckets
+
+    def __init__(self, values: Sequence[float] = None):
+        if values is None:
+            values = [0.] * self.size
+
+        self.values = values
+
+    @staticmethod
+    def shared() -> 'WorkerMetrics':
+        return WorkerMetrics(mp.RawArray('d', WorkerMetrics.size))
+
+    def add_input(self, n=1):
+        self.values[self.ITEMS_IN] += n
+
+    def add_service_time(self, dt: float):
+        self.values[self.ITEMS_OUT] += 1
+        self.values[self.BUSY] += dt
+        i = min(int(dt * 1e6).bit_length(), self.n_buckets - 1)
+        self.values[len(self.fields) + i] += 1
+
+    def add_idle_time(self, dt: float):
+        self.values[self.IDLE] += dt
+
+    def add_blocked_time(self, dt: float):
+        self.values[self.BLOCKED] += dt
+
+    def add_error(self):
+        """Count a failed attempt to process an item.
+        """
+        self.values[self.ERRORS] += 1
+
+    def add_failure(self):
+        """Count an item that could not be processed.
+        """
+        self.values[self.FAILURES] += 1
+
+    @property
+    def histogram(self) -> List[float]:
+        return list(self.values[len(self.fields):])
+
+    def as_dict(self) -> dict:
+        return dict(zip(self.fields, self.values[:len(self.fields)]))
+
+
+def histogram_percentile(histogram: Sequence[float], q: float) -> float:
+    """Return an upper bound (in seconds) of the q-th percentile of a
+    histogram of service times.
+    """
+    total = sum(histogram)
+    if not total:
+        return None
+
+    cumulative = 0
+    for i, n in enumerate(histogram):
+        cumulative += n
+        if cumulative >= q / 100 * total:
+            return 2 ** i * 1e-6
+
+
+def stage_statistics(workers: List[WorkerMetrics]) -> dict:
+    """Aggregate the metrics of all workers of a stage.
+
+    The utilization is the fraction of time that workers spend processing
+    items, rather than waiting for input (idle) or for the next stage (blocked).
+    """
+    result = dict.fromkeys(WorkerMetrics.fields, 0.)
+    histogram = np.zeros(WorkerMetrics.n_buckets)
+    for worker in workers:
+        for k, v in worker.as_dict().items():
+            result[k] += v
+        histogram += worker.histogram
+
+    for k in ('items_in', 'items_out', 'errors', 'failures'):
+        result[k] = int(result[k])
+
+    total = result['busy'] + result['idle'] + result['blocked']
+    result['utilization'] = result['busy'] / total if total else 0.
+
+    n = result['items_out']
+    result['mean'] = result['busy'] / n if n else None
+    for q in (50, 90, 99):
+        result[f'p{q}'] = histogram_percentile(histogram, q)
+
+    return result
@@ -3,15 +3,33 @@
 from aiohttp import ClientSession
 from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from contextlib import contextmanager
+from dataclasses import dataclass
+from enum import Enum, auto
+from typing import List, Tuple, Union
 import aiohttp
 import asyncio
 import collections
+import json
 import multiprocessing
 import numpy as np
+import os
 import sys
 import time
 
-from mash import util
+from mash import io_util, util
+from mash.webtools.metrics import ErrorCounter, TimeSeries, output_format, summary
+
+
+class EventLoop(Enum):
+    """Event loop implementations.
+    - default: the default asyncio loop
+    - uvloop: requires the optional dependency uvloop
+    - eager: the default loop with an eager task factory (Python 3.12+)
+    """
+    default = auto()
+    uvloop = auto()
+    eager = auto()
+
 
 ################################################################################
 # Use-cases
@@ -41,7 +59,8 @@ async def some_custom_func(session: ClientSession, i: int, url='', timeout=10):
 ################################################################################
 
 
-def run(func, items, batch_size, duration, n_threads=2, **kwds):
+def run(func, items, batch_size, duration, n_threads=2, output: str = None,
+        interval=1., **kwds):
     r"""Executes func(i) N x M times.
     It is assumed that all function invocations are independent.
 
@@ -52,11 +71,19 @@ def run(func, items, batch_size, duration, n_threads=2, **kwds):
         batch_size : number of function call results that are yielded
         duration : timeout of the process. This evaluated between batches and not during batches.
         n_threads : int
+        output : filename of a .csv or .jsonl file. Statistics are written per interval during the run.
+            A summary is written to a .summary.json file.
+        interval : the duration of an interval in seconds
         concurrency : max. number of async connections per thread
         \**kwds : arguments for `func`. func() must be threadsafe
         batches : iterable of iterables
+
+    Returns
+    -------
+        status : Counter of the (HTTP) status per successful call
+        times : the duration per successful call
+        exceptions : ErrorCounter
     """
-    refresh_interval = 0.5  # sec
     refresh_age = 0
 
     def partial(inputs):
@@ -64,56 +91,98 @@ def run(func, items, batch_size, duration, n_threads=2, **kwds):
 
     batches = util.group(items, batch_size)
     status = collections.Counter()
-    exceptions = collections.defaultdict(collections.Counter)
     times = []
 
-    t1 = time.perf_counter_ns()
+    t0 = time.perf_counter()
+    exceptions = ErrorCounter(interval=interval, t0=t0)
+    series = TimeSeries(interval, t0)
     dt = 0
 
-    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+    with open_output(output) as f, \
+            ThreadPoolExecutor(max_workers=n_threads) as executor:
         try:
             # TODO use lazy eval of items instead of .map
             generator = executor.map(partial, batches, timeout=duration)
 
             # use try-except to gracefully handle thread shutdown
             for results, errors in generator:
+                add_batch(results, errors, status, times, exceptions, series)
+                dt = time.perf_counter() - t0
 
-                for error in errors:
-                    exceptions[type(error)].update([str(error)])
-
-                if results:
-                    new_statusses, new_times = zip(*results)
-                    status.update(new_statusses)
-                    times.extend(new_times)
+                if f is not None:
+                    series.write(f, output_format(output))
 
-                    t2 = time.perf_counter_ns()
-                    dt = (t2 - t1) * 10**-9
-
-                    # show statistics
-                    if dt - refresh_age > refresh_interval and util.verbosity():
-                        refresh_age = 0
-                        show_status(status, times, dt, exceptions, end='\r')
+                refresh_age = refresh_status(status, times, dt, exceptions, refresh_age)
 
         except TimeoutError as e:
             print('Timeout')
 
-    for k, v in exceptions.items():
-        print(f'\n{k}\t {v}')
+        if f is not None:
+            series.write(f, output_format(output), final=True)
+
+    if exceptions.total:
+        print()
+        exceptions.show(series.successes)
 
     if times:
         show_status(status, times, dt, exceptions, new_line=True)
 
+    if output:
+        write_summary(output, summary(status, times, exceptions, dt))
+
     return status, times, exceptions
 
 
-def show_status(status, times, dt, exceptions=[], new_line=False, **kwds):
+def add_batch(results, errors, status: collections.Counter, times: list,
+              exceptions: ErrorCounter, series: TimeSeries):
+    """Add the results and errors of a single batch to the statistics of a run.
+    """
+    exceptions.extend(errors)
+    new_times = []
+
+    if results:
+        new_statusses, new_times = zip(*results)
+        status.update(new_statusses)
+        times.extend(new_times)
+
+    series.add(new_times, len(errors))
+
+
+def refresh_status(status, times, dt, exceptions, refresh_age, refresh_interval=0.5) -> float:
+    """Show statistics if the last refresh is older than `refresh_interval` seconds.
+    Return the time of the last refresh.
+    """
+    if times and dt - refresh_age > refresh_interval and io_util.verbosity():
+        show_status(status, times, dt, exceptions, end='\r')
+        return dt
+
+    return refresh_age
+
+
+@contextmanager
+def open_output(filename: str = None):
+    if filename is None:
+        yield None
+        return
+
+    with open(filename, 'w') as f:
+        yield f
+
+
+def write_summary(output: str, result: dict):
+    filename = os.path.splitext(output)[0] + '.summary.json'
+    with open(filename, 'w') as f:
+        json.dump(result, f, indent=2)
+
+
+def show_status(status, times, dt, exceptions: ErrorCounter = None, new_line=False, **kwds):
     # sort statusses for readability
     status = {k: v for k, v in sorted(status.items())}
 
     if new_line:
-        print('\n' + '-' * util.terminal_size().columns)
+        print('\n' + '-' * io_util.terminal_size().columns)
 
-    n_exceptions = len([v.values for v in exceptions.values()])
+    n_exceptions = exceptions.total if exceptions is not None else 0
 
     mu = np.mean(times)
     rel_std = np.std(times) / mu * 100
@@ -125,13 +194,108 @@ def show_status(status, times, dt, exceptions=[], new_line=False, **kwds):
     print(out, **kwds)
 
 
-def asynchronous(func, inputs, concurrency=4, **kwds):
+@dataclass
+class Step:
+    """The measured performance for a given level of concurrency.
+    """
+    concurrency: int
+    n_threads: int
+    tps: float
+    p99: float
+    error_rate: float
+    sustainable: bool = True
+
+    def __str__(self):
+        return f'> concurrency: {self.n_threads} x {self.concurrency}, ' \
+            f'\tTPS: {self.tps:.2f}, \tp99: {self.p99:.4f} s, ' \
+            f'\terror rate: {self.error_rate * 100:.2f} %'
+
+
+def search_concurrency(func, n_threads=2, start=1, max_concurrency=64, factor=2,
+                       max_p99=1., max_error_rate=0.01, requests_per_connection=8,
+                       duration=60, **kwds) -> Tuple[Union[Step, None], List[Step]]:
+    r"""Increase the concurrency until either the p99 latency or the error rate crosses a threshold.
+
+    Returns
+    -------
+        knee : the last sustainable step, or None if no step was sustainable
+        steps : all measured steps
+
+    Parameters
+    ----------
+        func : async funcion(client: aiohttp.ClientSession, \*) -> Result
+        n_threads : int
+        start : the initial number of async connections per thread
+        max_concurrency : the max. number of async connections per thread
+        factor : the multiplier of the concurrency after each step
+        max_p99 : the max. sustainable p99 latency in seconds
+        max_error_rate : the max. fraction of failures, including non-2xx statusses
+        requests_per_connection : the number of requests per connection in each step
+        duration : timeout of each step
+        \**kwds : arguments for `func`
+    """
+    steps = []
+    concurrency = start
+    while concurrency <= max_concurrency:
+        step = measure(func, concurrency, n_threads, requests_per_connection,
+                       duration, **kwds)
+        step.sustainable = step.p99 <= max_p99 and \
+            step.error_rate <= max_error_rate
+        steps.append(step)
+        print(step)
+
+        if not step.sustainable:
+            break
+
+        concurrency = max(concurrency + 1, int(concurrency * factor))
+
+    sustainable = [step for step in steps if step.sustainable]
+    knee = sustainable[-1] if sustainable else None
+
+    if sustainable:
+        best = max(sustainable, key=lambda step: step.tps)
+        print(f'Knee: {knee.n_threads} x {knee.concurrency} connections, '
+              f'max. sustainable TPS: {best.tps:.2f}')
+
+    return knee, steps
+
+
+def measure(func, concurrency, n_threads=2, requests_per_connection=8,
+            duration=60, **kwds) -> Step:
+    """Measure the throughput, p99 latency and error rate for a given concurrency.
+    """
+    batch_size = concurrency * requests_per_connection
+    n = batch_size * n_threads
+
+    t1 = time.perf_counter()
+    status, times, exceptions = run(func, range(n), batch_size, duration,
+                                    n_threads=n_threads,
+                                    concurrency=concurrency, **kwds)
+    dt = time.perf_counter() - t1
+
+    n_invalid = sum(v for k, v in status.items() if not is_success(k))
+    n_failures = exceptions.total + n_invalid
+    total = len(times) + exceptions.total
+    p99 = float(np.percentile(times, 99)) if times else float('inf')
+
+    return Step(concurrency, n_threads,
+                tps=(len(times) - n_invalid) / dt,
+                p99=p99,
+                error_rate=n_failures / total if total else 1.)
+
+
+def is_success(status) -> bool:
+    return isinstance(status, int) and 200 <= status < 400
+
+
+def asynchronous(func, inputs, concurrency=4, event_loop=EventLoop.default, **kwds):
     r"""Executes func(task) for every task in tasks.
 
     Parameters
     ----------
         func : async funcion(client: aiohttp.ClientSession, \*) -> Result
         tasks : iterable of (unique) input for each function invocation
+        event_loop : EventLoop or the name of an EventLoop
         * : constants arguments and keywords to be passed to each function
     """
     if concurrency < 1:
@@ -139,7 +303,7 @@ def asynchronous(func, inputs, concurrency=4, **kwds):
 
     # reference: https://docs.aiohttp.org/en/stable/client_reference.html
     # create new event loop for thread safety
-    with new_event_loop() as loop:
+    with new_event_loop(event_loop) as loop:
         result = loop.run_until_complete(
             _wrapper(func, inputs, concurrency, **kwds))
 
@@ -166,12 +330,16 @@ async def _wrapper(func, inputs, concurrency=2, **kwds):
     results = []
     errors = []
     for item in results_per_task:
+        if isinstance(item, asyncio.CancelledError):
+            # this worker was cancelled before it started
+            continue
+
         try:
             r, e = item
             results.extend(r)
             errors.extend(e)
         except TypeError:
-            errors.append([item])
+            errors.append(item)
 
     return results, errors
 
@@ -182,7 +350,7 @@ async def worker(func, queue: asyncio.Queue, results=[], errors=[], **kwds):
     try:
         # copy variables to prevent mutable state
         results = results.copy()
-        errors = results.copy()
+        errors = errors.copy()
 
         async with ClientSession() as session:
             while True:
@@ -210,9 +378,9 @@ async def try_task(func, inputs, session, results, errors, **kwds):
 
 
 @contextmanager
-def new_event_loop():
+def new_event_loop(event_loop=EventLoop.default):
     # automatically close custom loop to prevent leaking resources
-    loop = asyncio.new_event_loop()
+    loop = create_event_loop(event_loop)
     asyncio.set_event_loop(loop)
     try:
         yield loop
@@ -220,6 +388,44 @@ def new_event_loop():
         loop.close()
 
 
+def create_event_loop(event_loop=EventLoop.default) -> asyncio.AbstractEventLoop:
+    """Create a new event loop.
+    Raise an ImportError or NotImplementedError if `event_loop` is unavailable.
+    """
+    if isinstance(event_loop, str):
+        event_loop = EventLoop[event_loop]
+
+    if event_loop == EventLoop.uvloop:
+        # optional dependency
+        import uvloop
+        return uvloop.new_event_loop()
+
+    loop = asyncio.new_event_loop()
+
+    if event_loop == EventLoop.eager:
+        if not hasattr(asyncio, 'eager_task_factory'):
+            loop.close()
+            raise NotImplementedError(
+                'The eager task factory requires Python 3.12 or higher')
+
+        loop.set_task_factory(asyncio.eager_task_factory)
+
+    return loop
+
+
+def available_event_loops() -> List[EventLoop]:
+    loops = []
+    for event_loop in EventLoop:
+        try:
+            create_event_loop(event_loop).close()
+        except (ImportError, NotImplementedError):
+            continue
+
+        loops.append(event_loop)
+
+    return loops
+
+
 def main():
     # warning, this can cause high load
     url = 'http://localhost:5000/v1/noisy'
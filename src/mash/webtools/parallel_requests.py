@@ -2,9 +2,10 @@ import aiohttp
 from aiohttp import ClientSession
 import random
 
-from mash import util
+from mash import io_util, util
 from mash.server.routes.default import basepath
-from mash.webtools.parallel import asynchronous
+from mash.webtools.parallel import EventLoop, asynchronous, run
+from mash.webtools.scenario import Scenario
 from mash.webtools.pipeline import Processor, PushPull, Strategy, identity, constant, duplicate
 
 url = 'http://localhost:5000' + basepath
@@ -26,6 +27,21 @@ async def post(session: ClientSession, i: int, url='', timeout=10, **kwds):
             return response.status, result.decode()
 
 
+def load_test(scenario: Scenario, n=1000, duration=10, batch_size=16,
+              n_threads=4, concurrency=4, output: str = None,
+              event_loop=EventLoop.default):
+    """Run a weighted mix of requests and show a breakdown per request.
+    Optionally write statistics per interval to `output`, see `parallel.run`.
+    """
+    run(scenario.request, range(n), batch_size, duration,
+        n_threads=n_threads, output=output, concurrency=concurrency,
+        event_loop=event_loop)
+
+    print('-' * io_util.terminal_size().columns)
+    scenario.show_summary()
+    return scenario.summary()
+
+
 def parse_response_(response, default=None) -> int:
     items, errors = response
     if errors:
@@ -110,13 +126,10 @@ def run_compute_pipeline():
 
     compute = Processor.from_function(echo)
     concat = Processor.from_function(util.concat)
-    processors = [identity, compute, parse_response, concat, to_int, duplicate]
-    with PushPull(processors=processors) as pipeline:
-
-        pipeline.extend(items)
-
-        for item in items:
-            result = pipeline.process()
+    processors = [identity, (compute, 4), parse_response, concat, to_int,
+                  duplicate]
+    with PushPull(processors=processors, ordered=True) as pipeline:
+        for item, result in zip(items, pipeline.imap(items)):
             assert result == 2 * int(item)
             results.append(result)
 
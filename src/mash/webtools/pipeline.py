@@ -1,11 +1,83 @@
+from collections import deque, namedtuple
 from dataclasses import dataclass
-from time import sleep
-from typing import List, Tuple
+from time import perf_counter, sleep
+from typing import List, TextIO, Tuple, Union
 from functools import update_wrapper
 import copy
 from enum import Enum, auto
+import asyncio
+import inspect
+import json
 import multiprocessing as mp
+import multiprocessing.connection
 import queue
+import sys
+import threading
+
+from mash.webtools.metrics import WorkerMetrics, stage_statistics
+from mash.webtools.transport import Handle, SharedMemoryTransport, close
+
+# an item with an index, which is used to restore the order of items
+Envelope = namedtuple('Envelope', ['index', 'item'])
+
+# an item that could not be processed
+DeadLetter = namedtuple('DeadLetter', ['processor', 'item', 'error', 'attempts'])
+
+
+class ProcessingError(RuntimeError):
+    def __init__(self, dead_letter: DeadLetter):
+        super().__init__(f'{dead_letter.processor} failed after '
+                         f'{dead_letter.attempts} attempt(s): {dead_letter.error}')
+        self.dead_letter = dead_letter
+
+
+class WorkerCrashError(RuntimeError):
+    """A worker process crashed while the order of results had to be restored.
+    """
+
+
+class Batch(list):
+    """A group of items that is transferred at once between stages.
+    Batches are unpacked before items are processed.
+    """
+
+
+class Stop:
+    """A signal that instructs a worker thread to stop.
+    """
+
+
+class Crash:
+    """A signal that a worker process has crashed, which is sent to the consumer.
+    """
+
+    def __init__(self, worker: int, exitcode: int):
+        self.worker = worker
+        self.exitcode = exitcode
+
+
+class EndOfStream:
+    """A signal that a producer has no more items.
+
+    Each producer (worker) of a stage sends a single signal to the next stage.
+    The worker that receives the last of these signals forwards it to the other
+    workers of its stage, using `last=True`.
+    """
+
+    def __init__(self, last=False):
+        self.last = last
+
+
+class Tally:
+    """A counter with the interface of `mp.Value`, for threads and coroutines.
+    """
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def get_lock(self):
+        return self.lock
 
 
 class Processor:
@@ -27,12 +99,17 @@ class Processor:
         #     self.append(item)
 
         if item is None and self.buffer:
-            item = self.buffer.pop()
+            item = self.take()
             # except IndexError as e:
             #     raise IndexError(f'No item to process; {e}')
 
         return self.process_item(item)
 
+    def take(self):
+        """Remove and return the next input of `process_item`.
+        """
+        return self.buffer.pop()
+
     def process_item(self, item):
         """Override this method to change the default identiy method.
         """
@@ -41,6 +118,16 @@ class Processor:
     def ready_to_process(self) -> bool:
         return len(self.buffer) > 0
 
+    def deadline(self) -> float:
+        """Return the time (perf_counter) at which pending items must be processed, if any.
+        """
+        return None
+
+    def finish(self) -> list:
+        """Return the results of any remaining items at the end of a stream.
+        """
+        return []
+
     def clear(self):
         self.buffer = []
 
@@ -56,10 +143,12 @@ class Processor:
             new_func = Processor.from_function(func)
 
         Note that new_func and func must have the same name in order to be compatible with `pickle`.
+        This is only required by `Backend.process`.
 
         Parameters
         ----------
             pure_func : (object) -> object
+                Coroutine functions are supported by `Backend.asyncio`.
         """
         p = Processor()
         p._set_process_item_func(pure_func)
@@ -115,18 +204,64 @@ class Buffer(Processor):
 class Combiner(Buffer):
     """ Many-to-one
     e.g. Combiner(n=2) transforms items into pairs of items
+
+    Use `window` to limit the duration (in seconds) that items wait for a group to be completed.
+    Incomplete groups are returned at the end of a stream.
+    Override `process_item` to process whole groups, e.g. to send them in bulk.
     """
 
-    def process_item(self, item):
+    def __init__(self, *args, window: float = None, **kwds):
+        super().__init__(*args, **kwds)
+        self.window = window
+        self.started = perf_counter()
+
+    def process(self, item=None):
+        """Return the next group of items, in order of arrival.
+        """
+        if item is not None:
+            self.append(item)
+
         if not self.ready_to_process():
-            raise IndexError('Not enought item to process')
+            raise IndexError('Not enough items to process')
+
+        return self.process_item(self.take())
 
-        selection = self.items[:self.n]
-        self.items = self.items[self.n:]
+    def take(self) -> list:
+        selection = self.buffer[:self.n]
+        self.buffer = self.buffer[self.n:]
+        self.started = perf_counter()
         return selection
 
     def ready_to_process(self) -> bool:
-        return len(self.buffer) > self.n
+        if len(self.buffer) >= self.n:
+            return True
+
+        return bool(self.buffer) and self.window is not None \
+            and perf_counter() >= self.deadline()
+
+    def deadline(self) -> float:
+        if self.window is None or not self.buffer:
+            return None
+
+        return self.started + self.window
+
+    def finish(self) -> list:
+        if not self.buffer:
+            return []
+
+        selection = self.buffer
+        self.buffer = []
+        return [self.process_item(selection)]
+
+    def append(self, item):
+        if not self.buffer:
+            self.started = perf_counter()
+
+        self.buffer.append(item)
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
 
 
 class Distributer(Buffer):
@@ -143,59 +278,325 @@ class Distributer(Buffer):
 
 
 class Strategy(Enum):
+    """Flow control between stages.
+
+    - push: process items as soon as they arrive. Queues are unbounded.
+    - pull: process an item only if there is demand for it. Queues are bounded.
+    - constant: process items while there is room in the bounded output queue.
+    """
     push = auto()
     pull = auto()
     constant = auto()
 
 
+class Backend(Enum):
+    """The type of the workers of a PushPull pipeline.
+
+    - process: a process per worker. Processors must be picklable.
+    - thread: a thread per worker, e.g. for blocking I/O.
+    - asyncio: a coroutine per worker, on an event loop in a background thread.
+        Processors can define an async `process_item` method.
+    """
+    process = auto()
+    thread = auto()
+    asyncio = auto()
+
+
+@dataclass
+class Retry:
+    """A retry policy for items that cannot be processed.
+    The delay between attempts increases exponentially.
+    Other exceptions than `exceptions` are not retried.
+    """
+    max_attempts: int = 3
+    delay: float = 0.1
+    factor: float = 2.
+    exceptions: Tuple[type, ...] = (Exception,)
+
+    def __post_init__(self):
+        if self.max_attempts < 1:
+            raise ValueError(f'Invalid number of attempts: {self.max_attempts}')
+
+    def backoff(self, attempt: int) -> float:
+        return self.delay * self.factor ** attempt
+
+
+NO_RETRY = Retry(max_attempts=1)
+
+
 @dataclass
 class Resource:
+    """A worker that processes items from an input queue.
+
+    Results are sent in batches of at most `batch_size` items.
+    Incomplete batches are sent after `linger` seconds.
+
+    Large payloads can be passed through shared memory using a `transport`.
+
+    The time spent processing, waiting for input (idle) and waiting for the
+    next stage (blocked) is recorded in `metrics`.
+
+    Items that cannot be processed are retried according to the `retry` policy,
+    and are then forwarded as a `DeadLetter`.
+    """
     processor: Processor
     delivery_queues: Tuple[queue.Queue, queue.Queue]
-    demand_queues: Tuple[queue.Queue, queue.Queue] = None
+    demand: Tuple[mp.Semaphore, mp.Semaphore] = None
     strategy: Strategy = Strategy.push
+    batch_size: int = 1
+    linger: float = 0.01
+    transport: SharedMemoryTransport = None
+    metrics: WorkerMetrics = None
+
+    # the number of producers of the previous stage and of workers of this stage
+    n_producers: int = 1
+    n_peers: int = 1
+    # the number of EndOfStream signals that were received by this stage
+    n_received: Tally = None
+    # the first stage signals that new items can be appended
+    slots: mp.Semaphore = None
+    retry: Retry = None
 
     def start(self, max_items=None):
         self.handled_items = 0
+        self.index = None
+        self.batch = Batch()
+        self.deadline = None
+        self.inputs = []
+
+        if self.metrics is None:
+            self.metrics = WorkerMetrics()
 
         while True:
             if max_items is not None and self.handled_items >= max_items:
+                self.flush()
                 return
 
+            t1 = perf_counter()
             self.wait_for_input_demand()
             self.demand_input()
 
-            item = self.in_queue.get(block=True)
+            t2 = perf_counter()
+            items = self.get()
+            if isinstance(items, Stop):
+                return
+
+            self.metrics.add_blocked_time(t2 - t1)
+            self.metrics.add_idle_time(perf_counter() - t2)
+
+            if isinstance(items, EndOfStream):
+                if self.end_of_input(items):
+                    self.finish()
+                    return
+
+                self.return_demand()
+                continue
+
+            for item in unpack(items):
+                item = self.receive(item)
+                if isinstance(item, DeadLetter):
+                    # forward failures without processing them
+                    self.put(item)
+                    continue
+
+                self.processor.append(item)
+                self.process()
+                self.release_inputs()
 
-            self.processor.append(item)
-            self.process()
+            if self.batch and perf_counter() >= self.deadline:
+                self.flush()
+
+    def get(self):
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None:
+                return self.in_queue.get(block=True)
+
+            # send any pending results before blocking
+            try:
+                timeout = max(0, deadline - perf_counter())
+                return self.in_queue.get(timeout=timeout)
+            except queue.Empty:
+                self.process()
+                self.flush()
+
+    def next_deadline(self) -> float:
+        """Return the time at which pending items or results must be sent, if any.
+        """
+        deadlines = [self.processor.deadline()]
+        if self.batch:
+            deadlines.append(self.deadline)
+
+        return min((d for d in deadlines if d is not None), default=None)
+
+    def finish(self):
+        """Send any remaining results and forward the end of the stream.
+        """
+        for result in self.processor.finish():
+            self.put(result)
+
+        self.flush()
+        self.out_queue.put(EndOfStream())
+
+    def end_of_input(self, signal: EndOfStream) -> bool:
+        """Return True if all producers of the previous stage have finished.
+        """
+        if signal.last:
+            return True
+
+        if self.n_received is None:
+            return True
+
+        with self.n_received.get_lock():
+            self.n_received.value += 1
+            if self.n_received.value < self.n_producers:
+                return False
+
+        # the other workers of this stage are waiting for input
+        for _ in range(self.n_peers - 1):
+            self.in_queue.put(EndOfStream(last=True))
+
+        return True
+
+    def receive(self, item):
+        """Unpack an item, and return either the item or a view of its payload.
+        """
+        self.metrics.add_input()
+
+        if self.slots is not None:
+            self.slots.release()
+
+        if isinstance(item, Envelope):
+            self.index, item = item
+
+        if isinstance(item, Handle) and self.transport is not None:
+            shm, view = self.transport.attach(item)
+            self.inputs.append((item, shm, view))
+            item = view
+
+        return item
+
+    def release_inputs(self):
+        """Release all shared memory payloads of the current item.
+        """
+        if not self.inputs:
+            return
+
+        blocks = []
+        for handle, shm, _ in self.inputs:
+            self.transport.release(handle)
+            blocks.append(shm)
+
+        # remove references to views before closing
+        self.inputs = []
+        for shm in blocks:
+            close(shm)
+
+    def encode(self, item):
+        """Forward the handle of an unmodified payload, or create a new handle.
+        """
+        for handle, _, view in self.inputs:
+            if item is view:
+                self.transport.acquire(handle)
+                return handle
+
+        return self.transport.encode(item)
 
     def wait_for_input_demand(self):
-        if self.strategy == Strategy.push:
-            # never wait
+        """Block until there is demand for a new result.
+        Note that bounded queues block on .put() rather than here.
+        """
+        if self.strategy != Strategy.pull:
             return
 
-        if self.strategy == Strategy.pull and self.demand_queues[1] is not None:
-            self.demand_queues[1].get(block=True)
+        # prevent deadlocks due to pending results
+        self.flush()
+
+        if self.demand is not None and self.demand[1] is not None:
+            self.demand[1].acquire()
 
-        # in case of Strategy.constant:
-        # maintain a stable out_queue size
-        while not self.out_queue.empty():
-            sleep(0.01)
-        return
+    def return_demand(self):
+        """Return unused demand, e.g. if an input did not produce any results.
+        """
+        if self.strategy == Strategy.pull and self.demand is not None and self.demand[1] is not None:
+            self.demand[1].release()
 
     def demand_input(self):
-        if self.strategy == Strategy.pull and self.demand_queues[0] is not None and self.demand_queues[0].empty():
-            self.demand_queues[0].put(1)
+        """Request a single item from the previous stage.
+        """
+        if self.strategy == Strategy.pull and self.demand is not None and self.demand[0] is not None:
+            self.demand[0].release()
 
     def process(self):
-        while self.processor.buffer:
-            result = self.processor.process()
+        while self.processor.ready_to_process():
+            item = self.processor.take()
+            t1 = perf_counter()
+            result = self.attempt(item)
+            t2 = perf_counter()
+            self.metrics.add_service_time(t2 - t1)
+
             self.put(result)
+            self.metrics.add_blocked_time(perf_counter() - t2)
+
+    def attempt(self, item):
+        """Process an item according to the retry policy.
+        Return a DeadLetter if all attempts fail.
+        """
+        retry = self.retry or NO_RETRY
+        for attempt in range(retry.max_attempts):
+            try:
+                return self.processor.process_item(item)
+            except Exception as e:
+                error = e
+                self.metrics.add_error()
+                if not isinstance(e, retry.exceptions):
+                    break
+
+                if attempt + 1 < retry.max_attempts:
+                    sleep(retry.backoff(attempt))
+
+        return self.dead_letter(item, error, attempt + 1)
+
+    def dead_letter(self, item, error: Exception, attempts: int) -> DeadLetter:
+        self.metrics.add_failure()
+
+        if self.transport is not None:
+            # copy views of shared memory, which is released after processing
+            item = bytes(item) if isinstance(item, memoryview) else copy.copy(item)
+
+        name = getattr(self.processor, '__name__', type(self.processor).__name__)
+        return DeadLetter(name, item, f'{type(error).__name__}: {error}', attempts)
 
     def put(self, item):
-        self.out_queue.put(item)
+        item = self.prepare(item)
+
+        if self.batch_size == 1:
+            self.out_queue.put(item)
+            return
+
+        if not self.batch:
+            self.deadline = perf_counter() + self.linger
+
+        self.batch.append(item)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def prepare(self, item):
+        """Add metadata to a result and count it.
+        """
+        if self.transport is not None:
+            item = self.encode(item)
+
+        if self.index is not None:
+            item = Envelope(self.index, item)
+
         self.handled_items += 1
+        return item
+
+    def flush(self):
+        if self.batch:
+            self.out_queue.put(self.batch)
+            self.batch = Batch()
 
     @property
     def in_queue(self) -> queue.Queue:
@@ -206,27 +607,225 @@ class Resource:
         return self.delivery_queues[1]
 
 
+class AsyncResource(Resource):
+    """A Resource that runs as a coroutine and that uses asyncio queues.
+
+    The results of processors may be awaitable.
+    Note that synchronous processors block the event loop.
+    """
+
+    async def start(self, max_items=None):
+        self.handled_items = 0
+        self.index = None
+        self.batch = Batch()
+        self.deadline = None
+        self.inputs = []
+
+        if self.metrics is None:
+            self.metrics = WorkerMetrics()
+
+        while True:
+            if max_items is not None and self.handled_items >= max_items:
+                await self.flush()
+                return
+
+            t1 = perf_counter()
+            await self.wait_for_input_demand()
+            self.demand_input()
+
+            t2 = perf_counter()
+            items = await self.get()
+
+            self.metrics.add_blocked_time(t2 - t1)
+            self.metrics.add_idle_time(perf_counter() - t2)
+
+            if isinstance(items, EndOfStream):
+                if await self.end_of_input(items):
+                    await self.finish()
+                    return
+
+                self.return_demand()
+                continue
+
+            for item in unpack(items):
+                item = self.receive(item)
+                if isinstance(item, DeadLetter):
+                    await self.put(item)
+                    continue
+
+                self.processor.append(item)
+                await self.process()
+
+            if self.batch and perf_counter() >= self.deadline:
+                await self.flush()
+
+    async def get(self):
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None:
+                return await self.in_queue.get()
+
+            # send any pending results before blocking
+            try:
+                timeout = max(0, deadline - perf_counter())
+                return await asyncio.wait_for(self.in_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                await self.process()
+                await self.flush()
+
+    async def finish(self):
+        for result in self.processor.finish():
+            if inspect.isawaitable(result):
+                result = await result
+
+            await self.put(result)
+
+        await self.flush()
+        await self.out_queue.put(EndOfStream())
+
+    async def end_of_input(self, signal: EndOfStream) -> bool:
+        if signal.last or self.n_received is None:
+            return True
+
+        self.n_received.value += 1
+        if self.n_received.value < self.n_producers:
+            return False
+
+        for _ in range(self.n_peers - 1):
+            await self.in_queue.put(EndOfStream(last=True))
+
+        return True
+
+    async def wait_for_input_demand(self):
+        if self.strategy != Strategy.pull:
+            return
+
+        # prevent deadlocks due to pending results
+        await self.flush()
+
+        if self.demand is not None and self.demand[1] is not None:
+            await self.demand[1].acquire()
+
+    async def process(self):
+        while self.processor.ready_to_process():
+            item = self.processor.take()
+            t1 = perf_counter()
+            result = await self.attempt(item)
+            t2 = perf_counter()
+            self.metrics.add_service_time(t2 - t1)
+
+            await self.put(result)
+            self.metrics.add_blocked_time(perf_counter() - t2)
+
+    async def attempt(self, item):
+        retry = self.retry or NO_RETRY
+        for attempt in range(retry.max_attempts):
+            try:
+                result = self.processor.process_item(item)
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+
+            except Exception as e:
+                error = e
+                self.metrics.add_error()
+                if not isinstance(e, retry.exceptions):
+                    break
+
+                if attempt + 1 < retry.max_attempts:
+                    await asyncio.sleep(retry.backoff(attempt))
+
+        return self.dead_letter(item, error, attempt + 1)
+
+    async def put(self, item):
+        item = self.prepare(item)
+
+        if self.batch_size == 1:
+            await self.out_queue.put(item)
+            return
+
+        if not self.batch:
+            self.deadline = perf_counter() + self.linger
+
+        self.batch.append(item)
+        if len(self.batch) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if self.batch:
+            await self.out_queue.put(self.batch)
+            self.batch = Batch()
+
+
+class LoopQueue:
+    """A threadsafe interface to an asyncio.Queue of an event loop in a different thread.
+    """
+
+    def __init__(self, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop):
+        self.queue = queue
+        self.loop = loop
+
+    def put(self, item):
+        asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop).result()
+
+    def get(self, timeout: float = None):
+        coroutine = asyncio.wait_for(self.queue.get(), timeout)
+        try:
+            return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+        except asyncio.TimeoutError:
+            raise queue.Empty
+
+    def qsize(self) -> int:
+        return self.queue.qsize()
+
+
+class LoopSemaphore:
+    """A threadsafe interface to an asyncio.Semaphore of an event loop in a different thread.
+    """
+
+    def __init__(self, semaphore: asyncio.Semaphore, loop: asyncio.AbstractEventLoop):
+        self.semaphore = semaphore
+        self.loop = loop
+
+    def release(self):
+        self.loop.call_soon_threadsafe(self.semaphore.release)
+
+
+Stage = Union[Processor, Tuple[Processor, int]]
+
+
 class Pipeline(Processor):
     """A Processor that combines of multiple processing-stages.
 
+    Each stage is either a Processor or a pair (Processor, number of workers).
+
     Note that len(Pipeline) returns the length of the buffer of the whole Pipeline and not the total length of all components.
     """
 
-    def __init__(self, items=[], *, processors: List[Processor] = []):
+    def __init__(self, items=[], *, processors: List[Stage] = []):
         super().__init__(items)
 
         self.processors: List[Processor]
+        self.n_workers: List[Union[int, None]]
 
         self.init_processors(processors)
 
-    def init_processors(self, processors: List[Processor]):
+    def init_processors(self, processors: List[Stage]):
         self.processors = []
+        self.n_workers = []
         for p in processors:
+            n = None
+            if isinstance(p, tuple):
+                p, n = p
+                if n < 1:
+                    raise ValueError(f'Invalid number of workers: {n}')
+
             assert isinstance(p, Processor)
             # make a shallow copy of each processor
             processor = copy.copy(p)
             processor.clear()
             self.processors.append(processor)
+            self.n_workers.append(n)
 
     def __sizeof__(self) -> int:
         return len(self.processors)
@@ -236,56 +835,449 @@ class Pipeline(Processor):
 
 
 class PushPull(Pipeline):
+    # the default number of workers per stage
     n_processors = 1
 
-    def __init__(self, *args, strategy=Strategy.constant, **kwds):
+    def __init__(self, *args, strategy=Strategy.constant, credits=1,
+                 ordered=False, batch_size=1, linger=0.01,
+                 transport: SharedMemoryTransport = None,
+                 backend=Backend.process, max_in_flight: int = None,
+                 retry: Retry = None, timeout: float = None,
+                 report_interval: float = None, report_output: TextIO = None,
+                 **kwds):
         """A Pipeline with queues to pass items to be processed to subsequent processors.
+        Worker processes are restarted if they crash.
+
+        Usage
+        -----
+
+        .. code-block:: python
+
+            with PushPull(processors=[(compute, 4), concat]) as pipeline:
+                result = pipeline.process(item)
+
+            with PushPull(processors=[(compute, 4), concat]) as pipeline:
+                for result in pipeline.imap(items, ordered=True):
+                    ...
+
+        Parameters
+        ----------
+            processors : a list of Processors or pairs (Processor, number of workers).
+                All workers of a stage share the same input queue.
+            strategy : Strategy
+            credits : the max. number of outstanding items (or batches) per stage.
+                This is ignored by Strategy.push.
+            ordered : yield results in the same order as their inputs.
+                This requires stages that produce exactly one result per item.
+            batch_size : the max. number of items that are transferred at once between stages.
+            linger : the max. duration in seconds that items can wait for a batch to be completed.
+            transport : pass large payloads (e.g. numpy arrays) through shared memory.
+                Processors receive views of these payloads.
+                Results are returned as copies.
+                This requires Backend.process and one-to-one stages, i.e. no Buffers.
+            backend : run workers in processes, threads or coroutines.
+            max_in_flight : the max. number of items that have been appended but
+                not yet received by the first stage. Then .append() blocks.
+            retry : the retry policy of each stage.
+                Items that cannot be processed are collected in `dead_letters`.
+            timeout : the max. duration in seconds to wait for a result.
+                Otherwise a TimeoutError is raised.
+            report_interval : write the statistics of each stage periodically (in seconds).
+            report_output : the destination of reports as JSON lines, e.g. sys.stderr.
         """
         super().__init__(*args, **kwds)
 
         self.queues: List[mp.Queue]
         # self.delivery_queues: List[mp.Queue] = self.queues
-        self.demand_queues: List[mp.Queue] = None
-        self.resources: List[List[mp.Process]]
+        self.demand: List[mp.Semaphore] = None
+        self.resources: List[Union[mp.Process, threading.Thread, asyncio.Task]]
+
+        if credits < 1:
+            raise ValueError(f'Invalid number of credits: {credits}')
+
+        self.credits = credits
+        self.ordered = ordered
+        self.n_appended = 0
+        self.n_yielded = 0
+        self.reorder_buffer = {}
+
+        if batch_size < 1:
+            raise ValueError(f'Invalid batch size: {batch_size}')
+
+        self.batch_size = batch_size
+        self.linger = linger
+        self.batch = Batch()
+        self.input_lock = threading.Lock()
+        self.results = deque()
+        self.transport = transport
+
+        if ordered and any(isinstance(p, Buffer) for p in self.processors):
+            raise ValueError('Ordered output requires one-to-one stages')
+
+        if transport is not None and backend != Backend.process:
+            raise ValueError('Shared memory requires Backend.process')
+
+        if transport is not None and any(isinstance(p, Buffer) for p in self.processors):
+            # buffered views would be released before they are processed
+            raise ValueError('Shared memory requires one-to-one stages')
+
+        self.backend = backend
+        self.loop: asyncio.AbstractEventLoop = None
+
+        self.report_interval = report_interval
+        self.report_output = report_output
+        self.stopped = threading.Event()
+        self.t0 = perf_counter()
+
+        # the state of the end-of-stream signal
+        self.ended = False
+        self.finished = False
+        self.n_received = 0
+        self.feeder: threading.Thread = None
+        # an exception that was raised while appending the items of .imap()
+        self.feed_error: Exception = None
+
+        if max_in_flight is not None and max_in_flight < batch_size:
+            raise ValueError('The max. number of items in flight must not be '
+                             'smaller than the batch size')
+
+        self.max_in_flight = max_in_flight
+
+        self.retry = retry
+        self.timeout = timeout
+        self.dead_letters: List[DeadLetter] = []
+        self.n_restarts = 0
 
         self.init_resources(strategy)
         self.start_resources()
         self.process_buffer()
 
+        if report_interval is not None:
+            self.report_thread = threading.Thread(target=self.report, daemon=True)
+            self.report_thread.start()
+
     def init_resources(self, strategy):
         n_queues = len(self.processors) + 1
-        self.queues = [mp.Queue() for _ in range(n_queues)]
+
+        if self.backend == Backend.asyncio:
+            # queues and semaphores are created in the running loop, see `in_loop`
+            self.loop = asyncio.new_event_loop()
+            self.loop_thread = threading.Thread(target=self.loop.run_forever,
+                                                daemon=True)
+            self.loop_thread.start()
+
+        # the input queue is unbounded, such that .extend() never blocks
+        maxsize = 0 if strategy == Strategy.push else self.credits
+        queues = [self.new_queue()] + [self.new_queue(maxsize)
+                                       for _ in range(n_queues - 1)]
 
         if strategy == Strategy.pull:
-            self.demand_queues = [None] + [mp.Queue()
-                                           for _ in range(n_queues - 1)]
+            demand = [None] + [self.new_semaphore()
+                               for _ in range(n_queues - 1)]
         else:
-            self.demand_queues = [None] * n_queues
+            demand = [None] * n_queues
 
-        self.resources = []
+        # the number of items that can be appended
+        self.slots = None
+        if self.max_in_flight is not None:
+            self.slots = mp.Semaphore(self.max_in_flight) \
+                if self.backend == Backend.process \
+                else threading.Semaphore(self.max_in_flight)
 
+        self.workers = []
+        self.metrics = []
         for q, processor in enumerate(self.processors):
-            for p in range(PushPull.n_processors):
-                resource = Resource(processor,
-                                    self.queues[q: q + 2],
-                                    self.demand_queues[q: q + 2],
-                                    strategy)
-                process = mp.Process(target=resource.start)
-                self.resources.append(process)
+            n_received = mp.Value('i', 0) if self.backend == Backend.process \
+                else Tally()
+            n_producers = self.n_stage_workers(q - 1) if q else 1
+            for p in range(self.n_stage_workers(q)):
+                metrics = WorkerMetrics.shared() if self.backend == Backend.process \
+                    else WorkerMetrics()
+                # each worker has its own buffer
+                worker = copy.copy(processor)
+                worker.clear()
+                resource = self.new_resource(worker,
+                                             queues[q: q + 2],
+                                             demand[q: q + 2],
+                                             strategy,
+                                             self.batch_size,
+                                             self.linger,
+                                             self.transport,
+                                             metrics,
+                                             n_producers,
+                                             self.n_stage_workers(q),
+                                             n_received,
+                                             self.slots if q == 0 else None,
+                                             self.retry)
+                self.workers.append(resource)
+                self.metrics.append(metrics)
+
+        if self.backend == Backend.asyncio:
+            # the event loop is used from a different thread
+            queues = [LoopQueue(q, self.loop) for q in queues]
+            demand = [LoopSemaphore(d, self.loop) if d is not None else None
+                      for d in demand]
+
+        self.queues = queues
+        self.demand = demand
+
+        if self.backend == Backend.process:
+            self.resources = [mp.Process(target=resource.start)
+                              for resource in self.workers]
+        elif self.backend == Backend.thread:
+            self.resources = [threading.Thread(target=resource.start, daemon=True)
+                              for resource in self.workers]
+        else:
+            self.resources = []
+
+    def new_queue(self, maxsize=0):
+        if self.backend == Backend.process:
+            return mp.Queue(maxsize)
+        elif self.backend == Backend.thread:
+            return queue.Queue(maxsize)
+        return self.in_loop(asyncio.Queue, maxsize)
+
+    def new_semaphore(self):
+        if self.backend == Backend.process:
+            return mp.Semaphore(0)
+        elif self.backend == Backend.thread:
+            return threading.Semaphore(0)
+        return self.in_loop(asyncio.Semaphore, 0)
+
+    def in_loop(self, func, *args):
+        """Call `func` in the event loop thread and return the result.
+        Note that asyncio primitives are bound to the current event loop on Python < 3.10.
+        """
+        async def call():
+            return func(*args)
+
+        return asyncio.run_coroutine_threadsafe(call(), self.loop).result()
+
+    def new_resource(self, *args) -> Resource:
+        if self.backend == Backend.asyncio:
+            return AsyncResource(*args)
+        return Resource(*args)
+
+    def n_stage_workers(self, i: int) -> int:
+        return self.n_workers[i] or PushPull.n_processors
 
     def start_resources(self):
+        if self.backend == Backend.asyncio:
+            self.resources = asyncio.run_coroutine_threadsafe(
+                self.start_tasks(), self.loop).result()
+            return
+
         for resource in self.resources:
             resource.start()
 
+        if self.backend == Backend.process:
+            self.wakeup_reader, self.wakeup_writer = mp.Pipe(duplex=False)
+            self.supervisor = threading.Thread(target=self.supervise, daemon=True)
+            self.supervisor.start()
+
+    def supervise(self):
+        """Restart worker processes that have crashed, until a wakeup signal is received.
+        Note that the item that was being processed during a crash is lost.
+        If results are ordered, then the consumer is signalled to raise a WorkerCrashError,
+        rather than to wait for the lost item.
+        A crash during a transfer of data can corrupt a queue (see `multiprocessing.Queue`).
+        """
+        while True:
+            alive = {process.sentinel: i
+                     for i, process in enumerate(self.resources)
+                     if process.exitcode is None}
+            ready = mp.connection.wait(list(alive) + [self.wakeup_reader])
+            if self.wakeup_reader in ready:
+                return
+
+            for sentinel in ready:
+                i = alive[sentinel]
+                self.resources[i].join()
+                exitcode = self.resources[i].exitcode
+                if exitcode != 0:
+                    self.restart(i)
+                    if self.ordered:
+                        self.out_queue.put(Crash(i, exitcode))
+
+    def restart(self, i: int):
+        process = mp.Process(target=self.workers[i].start)
+        process.start()
+        self.resources[i] = process
+        self.n_restarts += 1
+
+    def stop_supervisor(self):
+        self.wakeup_writer.send(None)
+        self.supervisor.join()
+
+    def stats(self) -> List[dict]:
+        """Return the statistics of each stage, e.g. to find a bottleneck.
+
+        The queue depth is the number of items (or batches) that are waiting
+        for a stage. Note that it is unavailable on some platforms.
+        """
+        stages = []
+        i = 0
+        for q, processor in enumerate(self.processors):
+            n = self.n_stage_workers(q)
+            row = {'stage': q,
+                   'name': getattr(processor, '__name__', type(processor).__name__),
+                   'workers': n,
+                   'queue_depth': queue_depth(self.queues[q])}
+            row.update(stage_statistics(self.metrics[i: i + n]))
+            stages.append(row)
+            i += n
+
+        return stages
+
+    def report(self):
+        while not self.stopped.wait(self.report_interval):
+            self.write_stats()
+
+    def write_stats(self):
+        output = self.report_output or sys.stdout
+        t = perf_counter() - self.t0
+        for row in self.stats():
+            output.write(json.dumps({'t': t, **row}) + '\n')
+        output.flush()
+
+    async def start_tasks(self) -> List[asyncio.Task]:
+        return [asyncio.create_task(resource.start())
+                for resource in self.workers]
+
+    async def stop_tasks(self):
+        for task in self.resources:
+            task.cancel()
+
+        await asyncio.gather(*self.resources, return_exceptions=True)
+
+    def imap(self, items, ordered: bool = None):
+        """Process all items and yield the results.
+        Items are appended by a separate thread, such that results can be
+        yielded at the same time.
+
+        Usage
+        -----
+
+        .. code-block:: python
+
+            for result in pipeline.imap(items, ordered=True):
+                ...
+
+        Parameters
+        ----------
+            items : an iterable, which can be a generator.
+                Use `PushPull(max_in_flight=...)` to limit the number of pending items.
+                If it raises an exception, then the stream is ended and the exception
+                is raised again after the results of the preceding items.
+            ordered : yield results in the same order as their inputs.
+                Defaults to the setting of the pipeline.
+
+        Note that the stream ends after all items are appended,
+        hence a pipeline can process a single stream.
+        """
+        if self.ended:
+            raise RuntimeError('The stream has ended')
+
+        if ordered is not None:
+            if ordered and any(isinstance(p, Buffer) for p in self.processors):
+                raise ValueError('Ordered output requires one-to-one stages')
+
+            if self.n_appended > self.n_yielded:
+                raise ValueError('Cannot change the order of pending items')
+
+            self.ordered = ordered
+
+        self.feed_error = None
+        self.feeder = threading.Thread(target=self.feed, args=(items,),
+                                       daemon=True)
+        self.feeder.start()
+        yield from self
+
+        self.feeder.join()
+        if self.feed_error is not None:
+            raise self.feed_error
+
+    def feed(self, items):
+        """Append all items and then end the stream, also in case of an exception.
+        """
+        try:
+            for item in items:
+                if self.stopped.is_set():
+                    break
+
+                self.append(item)
+
+        except Exception as e:
+            self.feed_error = e
+
+        finally:
+            self.end_stream()
+
+    def end_stream(self):
+        """Signal that there are no more items, after which the workers finish.
+        """
+        if self.ended:
+            return
+
+        self.flush()
+        # before the signal is received, such that the stream cannot be restarted
+        self.ended = True
+        self.in_queue.put(EndOfStream())
+
+    def close(self, timeout=1.) -> bool:
+        """End the stream and discard all pending results.
+        Return True if all workers have finished within the timeout.
+        """
+        self.stopped.set()
+        if self.feeder is None:
+            self.end_stream()
+
+        deadline = perf_counter() + timeout
+
+        try:
+            while True:
+                try:
+                    item = self.get(timeout=max(0, deadline - perf_counter()))
+                except WorkerCrashError:
+                    continue
+
+                if self.ordered:
+                    item = item.item
+
+                # release shared memory
+                self.load(item)
+
+        except StopIteration:
+            return True
+        except queue.Empty:
+            return False
+
+    def stop_threads(self):
+        """Signal all threads to stop, and discard any pending items.
+        """
+        while any(thread.is_alive() for thread in self.resources):
+            for q, delivery_queue in enumerate(self.queues):
+                drain(delivery_queue)
+
+                if q < len(self.processors):
+                    try:
+                        for _ in range(self.n_stage_workers(q)):
+                            delivery_queue.put_nowait(Stop())
+                    except queue.Full:
+                        pass
+
+            for semaphore in self.demand:
+                if semaphore is not None:
+                    semaphore.release()
+
+            for thread in self.resources:
+                thread.join(timeout=0.01)
+
     def process(self, item=None):
         """ Process an item and then yield the result
         """
-        if self.demand_queues[-1] is not None:
-            # send a reverse signal to indicate demand
-            self.demand_queues[-1].put(1)
-
         if item is None and not self.buffer:
-            return next(self)
+            return self.result()
 
         return super().process(item)
 
@@ -294,7 +1286,7 @@ class PushPull(Pipeline):
             return item
 
         self.append(item)
-        return next(self)
+        return self.result()
 
     def process_buffer(self):
         for item in self.buffer:
@@ -302,7 +1294,37 @@ class PushPull(Pipeline):
 
     def append(self, item):
         # forward item to self.in_queue instead of self.buffer
-        self.in_queue.put(item)
+        if self.ended:
+            raise RuntimeError('The stream has ended')
+
+        if self.slots is not None:
+            self.slots.acquire()
+
+        if self.transport is not None:
+            item = self.transport.encode(item)
+
+        with self.input_lock:
+            if self.ordered:
+                item = Envelope(self.n_appended, item)
+
+            self.n_appended += 1
+
+            if self.batch_size == 1:
+                self.in_queue.put(item)
+                return
+
+            self.batch.append(item)
+            if len(self.batch) >= self.batch_size:
+                self.in_queue.put(self.batch)
+                self.batch = Batch()
+
+    def flush(self):
+        """Send any pending input items.
+        """
+        with self.input_lock:
+            if self.batch:
+                self.in_queue.put(self.batch)
+                self.batch = Batch()
 
     def extend(self, items):
         for item in items:
@@ -316,15 +1338,136 @@ class PushPull(Pipeline):
     def out_queue(self):
         return self.queues[-1]
 
+    def get(self, timeout: float = None):
+        """Return the next result in order of arrival.
+        Raise StopIteration after all workers have finished.
+        """
+        while not self.results:
+            if self.finished:
+                raise StopIteration
+
+            self.flush()
+
+            if self.demand[-1] is not None:
+                # send a reverse signal to indicate demand
+                self.demand[-1].release()
+
+            items = self.out_queue.get(timeout=timeout)
+
+            if isinstance(items, EndOfStream):
+                self.n_received += 1
+                n_producers = self.n_stage_workers(-1) if self.processors else 1
+                self.finished = self.n_received >= n_producers
+                continue
+
+            if isinstance(items, Crash):
+                raise WorkerCrashError(f'Worker {items.worker} crashed with exit code '
+                                       f'{items.exitcode}; the order of results cannot be restored')
+
+            self.results.extend(unpack(items))
+
+        return self.results.popleft()
+
+    def load(self, item):
+        if self.transport is None:
+            return item
+
+        return self.transport.load(item)
+
     def __next__(self):
-        return self.out_queue.get()
+        """Return the next result.
+        Items that could not be processed are skipped and collected in `dead_letters`.
+        """
+        while True:
+            item = self.next_result()
+            if not isinstance(item, DeadLetter):
+                return item
+
+            self.dead_letters.append(item)
+
+    def result(self):
+        """Return the next result, or raise a ProcessingError if it could not be processed.
+        """
+        item = self.next_result()
+        if isinstance(item, DeadLetter):
+            self.dead_letters.append(item)
+            raise ProcessingError(item)
+
+        return item
+
+    def next_result(self):
+        try:
+            if not self.ordered:
+                return self.load(self.get(self.timeout))
+
+            while self.n_yielded not in self.reorder_buffer:
+                index, item = self.get(self.timeout)
+                self.reorder_buffer[index] = self.load(item)
+
+        except queue.Empty:
+            raise TimeoutError(f'No result within {self.timeout} s')
+
+        item = self.reorder_buffer.pop(self.n_yielded)
+        self.n_yielded += 1
+        return item
+
+    def __iter__(self):
+        return self
 
     def __enter__(self, *args):
         return self
 
     def __exit__(self, *args):
+        self.stopped.set()
+        finished = self.close()
+
+        if self.backend == Backend.thread:
+            if not finished:
+                self.stop_threads()
+
+            for resource in self.resources:
+                resource.join()
+            return
+
+        if self.backend == Backend.asyncio:
+            asyncio.run_coroutine_threadsafe(self.stop_tasks(),
+                                             self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop_thread.join()
+            self.loop.close()
+            return
+
+        self.stop_supervisor()
+
         for resource in self.resources:
-            resource.terminate()
+            resource.join(timeout=0 if not finished else None)
+            if resource.is_alive():
+                resource.terminate()
+                resource.join()
+
+
+def unpack(items):
+    if isinstance(items, Batch):
+        return items
+    return [items]
+
+
+def queue_depth(delivery_queue: queue.Queue) -> int:
+    try:
+        return delivery_queue.qsize()
+    except NotImplementedError:
+        # e.g. mp.Queue on macOS
+        return None
+
+
+def drain(delivery_queue: queue.Queue):
+    """Discard all items of a queue without blocking.
+    """
+    try:
+        while True:
+            delivery_queue.get_nowait()
+    except queue.Empty:
+        pass
 
 
 def constant_(*args): return 1
@@ -0,0 +1,205 @@
+"""Weighted request scenarios for load tests.
+
+A scenario describes a mix of (templated) HTTP requests.
+Each request is chosen with a probability proportional to its weight.
+Templates are formatted using the request index `i` and the `variables` of the scenario.
+
+.. code-block:: yaml
+
+    url: http://localhost:5000/v1/
+    variables:
+        id: [1000, 1001, 1002]
+    requests:
+        - name: get_user
+          weight: 70
+          path: users/{id}
+        - name: create_user
+          weight: 30
+          method: POST
+          path: users
+          json:
+              name: user_{i}
+              email: user_{i}@example.com
+"""
+from aiohttp import ClientSession
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import accumulate
+from typing import Dict, List
+import aiohttp
+import numpy as np
+import random
+import time
+import yaml
+
+
+@dataclass
+class Request:
+    name: str
+    path: str
+    method: str = 'GET'
+    weight: float = 1.
+    headers: Dict[str, str] = None
+    json: object = None
+
+    def render(self, variables: dict) -> dict:
+        """Return the keyword arguments for `ClientSession.request`.
+        """
+        kwds = {'method': self.method.upper(),
+                'url': format_template(self.path, variables)}
+
+        if self.headers:
+            kwds['headers'] = format_template(self.headers, variables)
+
+        if self.json is not None:
+            kwds['json'] = format_template(self.json, variables)
+
+        return kwds
+
+
+@dataclass
+class Scenario:
+    requests: List[Request]
+    url: str = ''
+    variables: Dict[str, list] = field(default_factory=dict)
+    timeout: float = 10
+
+    # (status, duration) pairs per request name
+    results: Dict[str, list] = field(default_factory=dict,
+                                     init=False, repr=False)
+
+    def __post_init__(self):
+        if not self.requests:
+            raise ValueError('A scenario requires at least one request')
+
+        self.requests = [r if isinstance(r, Request) else Request(**r)
+                         for r in self.requests]
+
+        names = [r.name for r in self.requests]
+        if len(set(names)) < len(names):
+            # results are collected per name
+            duplicates = sorted({name for name in names if names.count(name) > 1})
+            raise ValueError(f'Duplicate request names: {duplicates}')
+
+        weights = [r.weight for r in self.requests]
+        if any(w < 0 for w in weights) or sum(weights) <= 0:
+            raise ValueError(f'Invalid weights: {weights}')
+
+        self.cumulative_weights = list(accumulate(weights))
+
+        empty = [k for k, v in self.variables.items() if not len(v)]
+        if empty:
+            raise ValueError(f'Variables without values: {empty}')
+
+        # pre-allocate results to keep request() threadsafe
+        self.results = {r.name: [] for r in self.requests}
+
+    @staticmethod
+    def from_dict(data: dict) -> 'Scenario':
+        try:
+            return Scenario(**data)
+        except TypeError as e:
+            raise ValueError(f'Invalid scenario: {e}')
+
+    @staticmethod
+    def from_yaml(text: str) -> 'Scenario':
+        return Scenario.from_dict(yaml.load(text, yaml.Loader))
+
+    @staticmethod
+    def read(filename: str) -> 'Scenario':
+        with open(filename) as f:
+            return Scenario.from_yaml(f.read())
+
+    def choose(self) -> Request:
+        return random.choices(self.requests,
+                              cum_weights=self.cumulative_weights)[0]
+
+    def template_variables(self, i: int) -> dict:
+        variables = {k: v[i % len(v)] for k, v in self.variables.items()}
+        variables['i'] = i
+        return variables
+
+    async def request(self, session: ClientSession, i: int):
+        """Perform a single request of the scenario.
+        This method is compatible with `parallel.run` and `parallel.asynchronous`.
+        """
+        request = self.choose()
+        kwds = request.render(self.template_variables(i))
+        kwds['url'] = self.url + kwds['url']
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        t1 = time.perf_counter_ns()
+        try:
+            async with session.request(timeout=timeout, **kwds) as response:
+                await response.read()
+                status = response.status
+
+        except Exception as e:
+            dt = (time.perf_counter_ns() - t1) * 10**-9
+            self.results[request.name].append((type(e).__name__, dt))
+            raise
+
+        dt = (time.perf_counter_ns() - t1) * 10**-9
+        self.results[request.name].append((status, dt))
+        return status, dt
+
+    def summary(self) -> Dict[str, dict]:
+        """Return the latency and status breakdown per request.
+        """
+        summary = {}
+        for name, results in self.results.items():
+            if not results:
+                summary[name] = {'N': 0, 'status': {}}
+                continue
+
+            statusses, times = zip(*results)
+            p50, p90, p99 = np.percentile(times, [50, 90, 99])
+            summary[name] = {'N': len(results),
+                             'status': dict(Counter(statusses)),
+                             'mean': float(np.mean(times)),
+                             'p50': float(p50),
+                             'p90': float(p90),
+                             'p99': float(p99)}
+        return summary
+
+    def show_summary(self):
+        for name, stats in self.summary().items():
+            out = f'> {name:<20} N: {stats["N"]}, \t{stats["status"]}'
+            if stats['N']:
+                out += f', \tE[t]: {stats["mean"]:0.4f} s' \
+                    f', \tp50: {stats["p50"]:0.4f} s' \
+                    f', \tp99: {stats["p99"]:0.4f} s'
+            print(out)
+
+
+def format_template(template, variables: dict):
+    """Format all strings in a (nested) template.
+    """
+    if isinstance(template, str):
+        return template.format(**variables)
+
+    if isinstance(template, dict):
+        return {k: format_template(v, variables) for k, v in template.items()}
+
+    if isinstance(template, list):
+        return [format_template(v, variables) for v in template]
+
+    return template
+
+
+example_yaml_data = """
+url: http://localhost:5000/v1/
+variables:
+    id: [1000, 1001, 1002]
+requests:
+    - name: get_user
+      weight: 70
+      path: users/{id}
+    - name: create_user
+      weight: 30
+      method: POST
+      path: users
+      json:
+          name: user_{i}
+          email: user_{i}@example.com
+"""
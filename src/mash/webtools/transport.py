@@ -0,0 +1,143 @@
+"""Transfer large payloads between processes using shared memory.
+
+Large payloads are copied once into a shared memory block.
+Only a small `Handle` is sent through queues.
+Each block has a reference count, such that it is freed after the last reference is released.
+
+Supported payloads are `bytes`, `bytearray` and numpy arrays.
+Note that attached payloads are views: numpy arrays or (read-write) memoryviews.
+"""
+from collections import namedtuple
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Tuple
+import multiprocessing as mp
+import numpy as np
+
+# the header of a shared memory block contains a reference count
+HEADER_SIZE = 64
+
+Handle = namedtuple('Handle', ['name', 'size', 'dtype', 'shape'])
+
+
+class SharedMemoryTransport:
+    def __init__(self, min_size=2**16):
+        """
+        Parameters
+        ----------
+            min_size : the min. number of bytes of a payload to use shared memory
+        """
+        self.min_size = min_size
+        self.lock = mp.Lock()
+
+        # share a single tracker with child processes, such that blocks that
+        # are created and freed by different processes are not reported as leaked
+        resource_tracker.ensure_running()
+
+    def is_large(self, payload) -> bool:
+        if isinstance(payload, (bytes, bytearray)):
+            return len(payload) >= self.min_size
+
+        if isinstance(payload, np.ndarray):
+            return payload.nbytes >= self.min_size and not payload.dtype.hasobject
+
+        return False
+
+    def encode(self, payload):
+        """Copy a large payload to shared memory and return a `Handle`.
+        Other payloads are returned as-is.
+        """
+        if not self.is_large(payload):
+            return payload
+
+        if isinstance(payload, np.ndarray):
+            size = payload.nbytes
+            handle_args = (payload.dtype.str, payload.shape)
+        else:
+            size = len(payload)
+            handle_args = (None, None)
+
+        shm = SharedMemory(create=True, size=HEADER_SIZE + size)
+        set_reference_count(shm, 1)
+
+        if isinstance(payload, np.ndarray):
+            target = np.ndarray(payload.shape, payload.dtype,
+                                buffer=shm.buf, offset=HEADER_SIZE)
+            target[...] = payload
+            del target
+        else:
+            shm.buf[HEADER_SIZE: HEADER_SIZE + size] = payload
+
+        handle = Handle(shm.name, size, *handle_args)
+        shm.close()
+        return handle
+
+    def attach(self, handle: Handle) -> Tuple[SharedMemory, object]:
+        """Return a view of the payload of a handle, without copying it.
+        The view must be deleted before the shared memory block is closed.
+        """
+        shm = SharedMemory(handle.name)
+        if handle.dtype is None:
+            view = shm.buf[HEADER_SIZE: HEADER_SIZE + handle.size]
+        else:
+            view = np.ndarray(handle.shape, handle.dtype,
+                              buffer=shm.buf, offset=HEADER_SIZE)
+        return shm, view
+
+    def load(self, item):
+        """Return a copy of the payload of a handle and release the handle.
+        Other items are returned as-is.
+        """
+        if not isinstance(item, Handle):
+            return item
+
+        shm, view = self.attach(item)
+        if isinstance(view, np.ndarray):
+            payload = view.copy()
+        else:
+            payload = bytes(view)
+            view.release()
+
+        del view
+        shm.close()
+        self.release(item)
+        return payload
+
+    def acquire(self, handle: Handle):
+        """Increment the reference count of a handle.
+        """
+        self.add_reference(handle, 1)
+
+    def release(self, handle: Handle):
+        """Decrement the reference count of a handle.
+        Free the shared memory block if there are no references left.
+        """
+        self.add_reference(handle, -1)
+
+    def add_reference(self, handle: Handle, n: int):
+        with self.lock:
+            shm = SharedMemory(handle.name)
+            count = reference_count(shm) + n
+            set_reference_count(shm, count)
+            shm.close()
+
+            if count <= 0:
+                shm.unlink()
+
+
+def reference_count(shm: SharedMemory) -> int:
+    return int.from_bytes(shm.buf[:8], 'little', signed=True)
+
+
+def set_reference_count(shm: SharedMemory, n: int):
+    shm.buf[:8] = n.to_bytes(8, 'little', signed=True)
+
+
+def close(shm: SharedMemory):
+    """Close a shared memory block, unless it is still in use by a view.
+    """
+    try:
+        shm.close()
+    except BufferError:
+        # the view is still referenced by e.g. a buffer of a processor
+        pass
@@ -0,0 +1,167 @@
+from copy import deepcopy
+from dataclasses import dataclass
+from typing import Dict, List
+import pytest
+
+from mash.object_parser.compiler import compile_plan
+from mash.object_parser.errors import BuildError, BuildErrors, SpecError, flatten, to_string
+from mash.object_parser.factory import JSONFactory, build, build_iter, build_many, validate
+from mash.server.domain.css import Document, generate_style
+from examples.object_parser import Organization, Team, example_data
+
+
+@dataclass
+class Point:
+    x: int
+    y: int = 0
+
+
+@dataclass
+class Shape:
+    points: Dict[str, Point]
+
+
+def test_compile_plan_is_cached():
+    plan = compile_plan(Document)
+    assert compile_plan(Document) is plan
+    assert plan.cls == Document
+    assert [key for key, *_ in plan.fields] == ['header', 'body', 'footer']
+
+
+def test_plan_build():
+    data = generate_style()
+    assert compile_plan(Document).build(data) == JSONFactory(Document).build(data)
+    assert build(Organization, example_data) == JSONFactory(
+        Organization).build(example_data)
+
+
+def test_plan_build_with_synonyms():
+    org = build(Organization, example_data)
+    assert org.ceo == example_data['boss']
+
+
+def test_plan_build_Dict_of_dataclasses():
+    shape = build(Shape, {'points': {'a': {'x': 1}}})
+    assert shape.points['a'] == Point(1)
+    assert JSONFactory(Shape).build({'points': {'a': {'x': 1}}}) == shape
+
+
+def test_plan_build_errors():
+    data = generate_style()
+    data['header']['margin']['left'] = 'null'
+
+    with pytest.raises(BuildErrors) as e:
+        build(Document, data)
+
+    with pytest.raises(BuildErrors) as expected:
+        JSONFactory(Document).build(data)
+
+    assert repr(e.value) == repr(expected.value)
+    assert 'header.margin.left: ' in repr(e.value)
+
+    with pytest.raises(BuildError):
+        build(Organization, {**example_data, 'unknown_key': 1})
+
+    with pytest.raises(SpecError):
+        build(Team, {'_secret': ''})
+
+    with pytest.raises(BuildErrors):
+        build(Team, {'manager': 'alice'})
+
+
+def invalid_style():
+    data = generate_style()
+    data['header']['margin']['left'] = 'null'
+    data['footer']['margin']['left'] = 'null'
+    return data
+
+
+def test_flatten_errors():
+    with pytest.raises(BuildErrors) as e:
+        build(Document, invalid_style())
+
+    messages = flatten(e.value)
+    assert len(messages) == 2
+    assert messages[0].startswith('header.margin.left: ')
+    assert to_string(e.value) == '\n'.join(messages)
+
+
+def test_build_many():
+    records = [generate_style(), invalid_style(), generate_style(), {}]
+    results, errors = build_many(Document, records)
+
+    assert results == [build(Document, generate_style())] * 2
+    assert list(errors) == [1, 3]
+    assert errors[1][1].startswith('footer.margin.left: ')
+    assert errors[3] == ['Invalid input']
+
+
+def test_build_many_with_processes():
+    records = [generate_style(), invalid_style()] * 5
+    expected = build_many(Document, records)
+    assert build_many(Document, records, processes=2, chunksize=3) == expected
+
+
+def test_build_iter():
+    records = (style for style in [generate_style(), {}, invalid_style()])
+    results = list(build_iter(Document, records, chunksize=2))
+
+    assert results[0] == build(Document, generate_style())
+    assert isinstance(results[1], BuildError)
+    assert isinstance(results[2], BuildErrors)
+
+
+def test_build_iter_with_processes():
+    records = [generate_style(), invalid_style(), {}] * 4
+    results = list(build_iter(Document, iter(records), processes=2, chunksize=2))
+
+    assert len(results) == len(records)
+    assert results[::3] == [build(Document, generate_style())] * 4
+    assert [flatten(e) for e in results[1::3]] == [flatten(e) for e in build_iter(Document, records[1::3])]
+    assert all(flatten(e) == ['Invalid input'] for e in results[2::3])
+
+
+def test_validate():
+    assert validate(Document, generate_style()) == []
+    assert validate(Organization, example_data) == []
+
+    with pytest.raises(BuildErrors) as e:
+        build(Document, invalid_style())
+
+    assert validate(Document, invalid_style()) == flatten(e.value)
+    assert validate(Document, {}) == ['Invalid input']
+    assert len(validate(Team, {'manager': 'alice'})) == 2
+
+
+def malformed_variants(data, values=(None, {}, [], 'x', 5, [{}], {'x': {}})):
+    """Yield copies of `data` in which a single value is replaced.
+    """
+    items = data.items() if isinstance(data, dict) else enumerate(data)
+    for k, v in items:
+        for value in values:
+            variant = deepcopy(data)
+            variant[k] = value
+            yield variant
+
+        if isinstance(v, (dict, list)):
+            for inner in malformed_variants(v, values):
+                variant = deepcopy(data)
+                variant[k] = inner
+                yield variant
+
+
+def test_validate_malformed_variants():
+    for data in malformed_variants(generate_style()):
+        try:
+            build(Document, data)
+            expected = []
+        except SpecError as e:
+            expected = flatten(e)
+
+        assert validate(Document, data) == expected, data
+
+
+def test_validate_first():
+    errors = validate(Document, invalid_style(), first=True)
+    assert len(errors) == 1
+    assert errors[0].startswith('header.margin.left: ')
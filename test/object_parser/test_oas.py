@@ -1,3 +1,6 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
+
 from examples.object_parser import Organization, SuperUser, example_data, Capacity
 from mash.object_parser.factory import build
 from mash.object_parser.oas import OAS
@@ -6,8 +9,8 @@ json = example_data
 
 members = {'type': 'array',
            'items': {'type': 'string'}}
-stakeholders = {'type': 'array',
-                'items': {'$ref': '#/components/schemas/SuperUser'}}
+stakeholders = {'type': 'object',
+                'additionalProperties': {'$ref': '#/components/schemas/SuperUser'}}
 team_type = {'type': 'string', 'enum': ['A', 'B']}
 properties = {'manager': {'type': 'string'},
               'members': members,
@@ -59,3 +62,50 @@ def test_oas_components():
     teams = {'type': 'array',
              'items': {'$ref': '#/components/schemas/Team'}}
     assert oas.components['Department']['properties']['teams'] == teams
+
+
+@dataclass
+class Node:
+    name: str
+    children: List['Node']
+
+
+def test_oas_from_type():
+    org = build(Organization, json)
+
+    oas = OAS()
+    oas.extend(org)
+
+    expected = OAS()
+    expected.extend(Organization)
+    assert oas.components == expected.components
+    assert oas.components['Team']['properties'] == properties
+    assert OAS().components == {}
+
+
+def test_oas_cycle():
+    oas = OAS()
+    oas.extend(Node)
+    children = {'type': 'array',
+                'items': {'$ref': '#/components/schemas/Node'}}
+    assert oas.components['Node']['properties']['children'] == children
+
+
+@dataclass
+class Options:
+    name: Optional[str] = None
+    node: Optional[Node] = None
+    value: Union[int, str] = 0
+    labels: Dict[str, int] = None
+
+
+def test_oas_optional_and_union():
+    oas = OAS()
+    oas.extend(Options(name='a'))
+    props = oas.components['Options']['properties']
+
+    assert props['name'] == {'type': 'string', 'nullable': True}
+    assert props['node'] == {'$ref': '#/components/schemas/Node'}
+    assert props['value'] == {'oneOf': [{'type': 'integer'}, {'type': 'string'}]}
+    assert props['labels'] == {'type': 'object',
+                               'additionalProperties': {'type': 'integer'}}
@@ -0,0 +1,46 @@
+from json import loads as json_loads
+import pytest
+
+from mash.object_parser.factory import build
+from mash.object_parser.serializer import TAG, deserialize, dumps, loads, serialize
+from mash.server.domain.css import Document, generate_style
+from mash.util import register_dataclass
+from examples.object_parser import Organization, example_data
+
+
+def test_serialize():
+    document = build(Document, generate_style())
+    data = serialize(document)
+
+    assert data['header']['border']['style'] == 'dotted'
+    assert data['body'][0]['margin'] == {'bottom': 0., 'left': 0., 'right': 0., 'top': 0.}
+    assert build(Document, data) == document
+
+    # objects are not shared
+    assert data['body'] is not document.body
+
+
+def test_dumps_loads():
+    org = build(Organization, example_data)
+
+    assert loads(dumps(org), Organization) == org
+    assert loads(dumps(org, as_bytes=True), Organization) == org
+
+    data = json_loads(dumps(org))
+    assert data['ceo'] == 'bob'
+    assert data['departments'][0]['teams'][0]['team_type'] == 'A'
+
+
+def test_tagged():
+    document = build(Document, generate_style())
+    text = dumps(document, tagged=True)
+
+    assert json_loads(text)[TAG] == 'mash.server.domain.css.Document'
+    assert json_loads(text)['header'][TAG] == 'mash.server.domain.css.Element'
+
+    # classes must be registered to be looked up
+    register_dataclass(Document)
+    assert loads(text) == document
+
+    with pytest.raises(TypeError):
+        deserialize({TAG: 'UnknownClass'})
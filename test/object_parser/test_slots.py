@@ -0,0 +1,57 @@
+from dataclasses import FrozenInstanceError, dataclass
+import pytest
+
+from mash.object_parser.errors import SpecError
+from mash.object_parser.factory import build
+from mash.object_parser.slots import slotted
+from mash.server.domain.css import Document, generate_style
+from examples.object_parser import Organization, example_data
+
+
+@dataclass
+class Point:
+    x: int
+    y: int = 0
+
+
+def test_slotted():
+    variant = slotted(Document)
+    assert slotted(Document) is variant
+    assert variant is not Document
+    assert variant.__slots__ == ('header', 'body', 'footer')
+    assert variant.__qualname__ == Document.__qualname__
+
+
+def test_build_with_slots():
+    data = generate_style()
+    document = build(Document, data, slots=True)
+
+    assert not hasattr(document, '__dict__')
+    assert not hasattr(document.body[0].border, '__dict__')
+    assert repr(document) == repr(build(Document, data))
+
+    document.footer = None
+
+
+def test_build_frozen():
+    document = build(Document, generate_style(), frozen=True)
+    assert not hasattr(document, '__dict__')
+
+    with pytest.raises(FrozenInstanceError):
+        document.footer = None
+
+    assert hash(document.header) == hash(document.footer)
+
+
+def test_build_with_slots_and_hooks():
+    org = build(Organization, example_data, slots=True)
+    assert org.ceo == example_data['boss']
+    assert org.departments[0].teams[0].active
+
+
+def test_slotted_defaults():
+    point = build(Point, {'x': 1}, slots=True)
+    assert (point.x, point.y) == (1, 0)
+
+    with pytest.raises(SpecError):
+        build(Point, {'y': 1}, slots=True)
@@ -0,0 +1,55 @@
+from io import BytesIO, StringIO
+import json
+import pytest
+import yaml
+
+from mash.object_parser.factory import build
+from mash.object_parser.stream import build_stream, iter_json, parse_path
+from mash.server.domain.css import Document, generate_style
+from mash.webtools.html_table_data import HTMLTableData, Row, example_yaml_data
+
+
+def test_parse_path():
+    assert parse_path('[*]') == ['*']
+    assert parse_path('rows[*].row') == ['rows', '*', 'row']
+
+    with pytest.raises(ValueError):
+        parse_path('rows[0]')
+
+
+def test_iter_json():
+    data = {'skipped': [{'a': '[{"}'}, 2], 'items': [1, 23456, -7.5e3, 'x', None, [], {}], 'end': 0}
+    text = json.dumps(data)
+
+    for chunk_size in (1, 3, 1000):
+        items = list(iter_json(StringIO(text), 'items[*]', chunk_size))
+        assert items == data['items']
+
+    assert list(iter_json(BytesIO(text.encode()), 'end')) == [0]
+    assert list(iter_json(StringIO('[]'))) == []
+    assert list(iter_json(StringIO('{"a": [{"b": 1}, {"b": 2}]}'), 'a[*].b')) == [1, 2]
+
+
+def test_iter_json_invalid():
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json(StringIO('[1, 2')))
+
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json(StringIO('{"items": 1}'), 'items[*]'))
+
+
+def test_build_stream(tmp_path):
+    records = [generate_style()] * 3
+    fn = tmp_path / 'documents.json'
+    fn.write_text(json.dumps(records))
+
+    expected = build(Document, records[0])
+    assert list(build_stream(Document, fn, chunk_size=64)) == [expected] * 3
+
+
+def test_build_stream_nested():
+    data = yaml.load(example_yaml_data, yaml.Loader)
+    f = BytesIO(json.dumps(data).encode())
+
+    rows = list(build_stream(Row, f, 'rows[*]', chunk_size=16))
+    assert rows == build(HTMLTableData, data).rows
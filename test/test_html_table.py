@@ -1,7 +1,8 @@
 import yaml
 
+from mash.object_parser import build
 from mash.webtools.html_table import generate
-from mash.webtools.html_table_data import example_yaml_data, parse_json
+from mash.webtools.html_table_data import HTMLTableData, Markdown, Parameters, example_yaml_data, parse_json, render
 
 expected_html = """
 <table>
@@ -46,3 +47,24 @@ def test_html_table_generate():
 
     body = str(doc.body.children[1]).strip()
     assert body == expected_html.strip()
+
+
+def test_html_table_render_cells():
+    json = yaml.load(example_yaml_data, yaml.Loader)
+    json['rows'] *= 100
+
+    render.cache_clear()
+    data = parse_json(json)
+    assert render.cache_info().misses == 8
+
+    assert data.rows[0] == data.rows[-2]
+    assert data.parameters.headings['first'] == '<p><em>First</em> Heading</p>\n'
+    assert isinstance(data.rows[0].row['first'][0], Markdown)
+    assert data == build(HTMLTableData, json)
+
+
+def test_html_table_Markdown():
+    # raw markdown is rendered, regardless of its type
+    headings = {'first': Markdown('**First**')}
+    parameters = build(Parameters, {'headings': headings})
+    assert parameters.headings['first'] == '<p><strong>First</strong></p>\n'
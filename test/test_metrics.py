@@ -0,0 +1,100 @@
+from collections import Counter
+from io import StringIO
+from aiohttp import ClientResponseError
+import csv
+import json
+
+from mash.webtools.metrics import ErrorCounter, ErrorKey, TimeSeries, error_key, output_format, summary
+
+
+def test_error_key():
+    assert error_key(ValueError('a')) == ErrorKey('ValueError', None, None)
+    assert error_key(OSError(111, 'refused')).errno == 111
+
+    error = ClientResponseError(None, (), status=503)
+    assert error_key(error) == ErrorKey('ClientResponseError', None, 503)
+
+
+def test_ErrorCounter():
+    errors = ErrorCounter(max_samples=2)
+    errors.extend([ValueError(i) for i in range(100)])
+    errors.add(KeyError('a'))
+
+    assert errors.total == 101
+    assert errors.counts[error_key(ValueError())] == 100
+
+    # at most one sample per key per interval
+    assert errors.samples[error_key(ValueError())] == ['0']
+    assert len(errors.samples) == 2
+
+
+def test_ErrorCounter_max_samples():
+    errors = ErrorCounter(max_samples=2, interval=1)
+    for t in range(5):
+        errors.add(ValueError(t), errors.t0 + t)
+
+    assert errors.samples[error_key(ValueError())] == ['0', '1']
+    assert errors.timeline == {i: 1 for i in range(5)}
+
+
+def test_ErrorCounter_error_rate():
+    errors = ErrorCounter(interval=1)
+    errors.add(ValueError(), errors.t0)
+    errors.add(ValueError(), errors.t0 + 1.5)
+    rates = errors.error_rate(Counter({0: 3, 2: 1}))
+    assert rates == {0: 0.25, 1: 1., 2: 0.}
+
+
+def test_TimeSeries():
+    series = TimeSeries(interval=1)
+    series.add([0.1, 0.2], 0, series.t0)
+    series.add([0.3], 1, series.t0 + 2.5)
+
+    assert series.n_buckets == 3
+    assert series.successes == {0: 2, 2: 1}
+
+    rows = list(series.rows())
+    assert [row['N'] for row in rows] == [2, 0, 1]
+    assert rows[0]['tps'] == 2
+    assert rows[1]['p99'] is None
+    assert rows[2]['error_rate'] == 0.5
+
+
+def test_TimeSeries_write():
+    series = TimeSeries(interval=1)
+    series.add([0.1, 0.2], 2, series.t0)
+    series.add([0.3], 0, series.t0 + 1.5)
+
+    f = StringIO()
+    series.write(f, 'csv', final=True)
+    rows = list(csv.DictReader(StringIO(f.getvalue())))
+    assert len(rows) == 2
+    assert rows[0]['errors'] == '2'
+
+    f = StringIO()
+    series.n_written = 0
+    series.write(f, 'jsonl', final=True)
+    rows = [json.loads(line) for line in f.getvalue().splitlines()]
+    assert rows[1]['N'] == 1
+
+    # rows are only written once
+    series.write(f, 'jsonl', final=True)
+    assert len(f.getvalue().splitlines()) == 2
+
+
+def test_summary():
+    errors = ErrorCounter()
+    errors.add(ValueError())
+    result = summary(Counter({200: 3}), [0.1, 0.2, 0.3], errors, 2.)
+    assert result['N'] == 3
+    assert result['errors'] == 1
+    assert result['tps'] == 1.5
+    assert result['error_rate'] == 0.25
+    assert result['status'] == {'200': 3}
+    assert result['max'] == 0.3
+    assert json.dumps(result)
+
+
+def test_output_format():
+    assert output_format('a.csv') == 'csv'
+    assert output_format('a.jsonl') == 'jsonl'
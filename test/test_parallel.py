@@ -1,7 +1,11 @@
+import json
 import pytest
 
 from aiohttp import ClientSession
 from mash.webtools.parallel import *
+from mash.webtools.metrics import error_key
+from mash.server.routes.default import basepath
+from mash.server.server import serve_in_background
 
 
 # class Test(pytest.testcase):
@@ -44,3 +48,99 @@ async def stub(session: ClientSession, i: int, url=''):
 #     out_queue = queue.Queue()
 #     agg_queue = queue.Queue()
 #     return in_queue, out_queue, agg_queue
+
+
+def test_run_with_errors():
+    status, times, exceptions = run(stub, range(100), 10, 5, n_threads=2)
+    assert not status
+    assert not times
+    assert exceptions.total == 100
+    assert len(exceptions.counts) == 1
+    assert len(exceptions.samples[error_key(NoResult())]) == 1
+
+
+def test_run_with_output(tmp_path):
+    output = str(tmp_path / 'results.jsonl')
+    run(stub, range(10), 5, 5, n_threads=1, output=output, interval=0.1)
+
+    with open(output) as f:
+        rows = [json.loads(line) for line in f]
+
+    assert sum(row['errors'] for row in rows) == 10
+
+    with open(str(tmp_path / 'results.summary.json')) as f:
+        result = json.load(f)
+
+    assert result['errors'] == 10
+    assert result['error_rate'] == 1.
+
+
+def test_search_concurrency():
+    with serve_in_background() as url:
+        url += basepath + 'sleep?time=0.01'
+        knee, steps = search_concurrency(some_custom_func, n_threads=1,
+                                         max_concurrency=4,
+                                         requests_per_connection=2,
+                                         url=url)
+
+    assert [step.concurrency for step in steps] == [1, 2, 4]
+    assert all(step.sustainable for step in steps)
+    assert knee == steps[-1]
+    assert all(step.tps > 0 for step in steps)
+    assert all(step.p99 >= 0.01 for step in steps)
+
+
+def test_search_concurrency_with_threshold():
+    with serve_in_background() as url:
+        url += basepath + 'sleep?time=0.01'
+        knee, steps = search_concurrency(some_custom_func, n_threads=1,
+                                         max_p99=0.001,
+                                         requests_per_connection=2,
+                                         url=url)
+
+    assert knee is None
+    assert len(steps) == 1
+    assert not steps[0].sustainable
+
+
+def test_search_concurrency_with_errors():
+    knee, steps = search_concurrency(stub, n_threads=1, max_concurrency=2)
+    assert knee is None
+    assert steps[0].error_rate == 1.
+
+
+def test_is_success():
+    assert is_success(200)
+    assert not is_success(503)
+    assert not is_success('ValueError')
+
+
+def test_new_event_loop():
+    with new_event_loop() as loop:
+        assert loop.run_until_complete(asyncio.sleep(0, 'ok')) == 'ok'
+
+    assert loop.is_closed()
+
+
+def test_create_event_loop():
+    loops = available_event_loops()
+    assert EventLoop.default in loops
+
+    for event_loop in loops:
+        loop = create_event_loop(event_loop.name)
+        assert loop.run_until_complete(asyncio.sleep(0, 1)) == 1
+        loop.close()
+
+    for event_loop in set(EventLoop) - set(loops):
+        with pytest.raises((ImportError, NotImplementedError)):
+            create_event_loop(event_loop)
+
+    with pytest.raises(KeyError):
+        create_event_loop('unknown')
+
+
+def test_asynchronous_with_event_loop():
+    for event_loop in available_event_loops():
+        results, errors = asynchronous(stub, range(4), event_loop=event_loop)
+        assert not results
+        assert len(errors) == 4
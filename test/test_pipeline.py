@@ -1,8 +1,16 @@
 import pytest
 from queue import Empty
+import asyncio
+import io
+import json
 import multiprocessing as mp
+import numpy as np
+import os
+import random
+from time import perf_counter, sleep
 
 from mash.webtools.pipeline import *
+from mash.webtools.transport import SharedMemoryTransport
 
 
 def test_Resource():
@@ -19,6 +27,453 @@ def test_Resource():
     assert result == 1
 
 
+def sleep_randomly_(x):
+    sleep(random.random() * 0.01)
+    return x
+
+
+sleep_randomly = Processor.from_function(sleep_randomly_)
+
+
+@pytest.fixture(params=list(Backend), ids=lambda backend: backend.name)
+def backend(request):
+    return request.param
+
+
+def test_PushPull_with_multiple_workers(backend):
+    items = list(range(20))
+    processors = [(sleep_randomly, 4), duplicate]
+    with PushPull(processors=processors, ordered=True,
+                  backend=backend) as pipeline:
+        assert pipeline.n_workers == [4, None]
+        assert len(pipeline.resources) == 5
+
+        pipeline.extend(items)
+        results = [pipeline.process() for _ in items]
+
+    assert results == [2 * i for i in items]
+    assert all(resource.done() if backend == Backend.asyncio
+               else not resource.is_alive()
+               for resource in pipeline.resources)
+
+
+def test_PushPull_with_multiple_workers_unordered(backend):
+    items = list(range(20))
+    with PushPull(processors=[(sleep_randomly, 4)],
+                  backend=backend) as pipeline:
+        pipeline.extend(items)
+        results = [pipeline.process() for _ in items]
+
+    assert sorted(results) == items
+
+
+def test_PushPull_ordered_with_buffers():
+    with pytest.raises(ValueError):
+        PushPull(processors=[Distributer()], ordered=True)
+
+    with pytest.raises(ValueError):
+        PushPull(processors=[(identity, 0)])
+
+
+def test_Resource_with_batches():
+    in_queue = mp.Queue()
+    out_queue = mp.Queue()
+
+    in_queue.put(Batch([1, 2, 3]))
+    resource = Resource(duplicate, (in_queue, out_queue), batch_size=2)
+    resource.start(max_items=3)
+
+    assert out_queue.get(timeout=.3) == [2, 4]
+    assert out_queue.get(timeout=.3) == [6]
+
+
+def test_PushPull_with_batches(backend):
+    items = list(range(200))
+    processors = [(sleep_randomly, 2), duplicate]
+    with PushPull(processors=processors, ordered=True, batch_size=16,
+                  strategy=Strategy.push, backend=backend) as pipeline:
+        pipeline.extend(items)
+        results = [pipeline.process() for _ in items]
+
+        # a single item is sent after the linger period
+        assert pipeline.process(1) == 2
+
+    assert results == [2 * i for i in items]
+
+
+def test_PushPull_with_batches_of_lists(backend):
+    # lists are not confused with batches
+    items = [[1], [2, 3]]
+    with PushPull(processors=[identity], batch_size=4,
+                  backend=backend) as pipeline:
+        pipeline.extend(items)
+        assert [pipeline.process() for _ in items] == items
+
+
+@pytest.mark.parametrize('strategy', list(Strategy))
+def test_PushPull_with_strategy(backend, strategy):
+    items = list(range(20))
+    processors = [identity, (duplicate, 2)]
+    with PushPull(processors=processors, strategy=strategy, ordered=True,
+                  backend=backend) as pipeline:
+        pipeline.extend(items)
+        results = [pipeline.process() for _ in items]
+
+    assert results == [2 * i for i in items]
+
+
+def test_PushPull_with_credits(backend):
+    items = list(range(20))
+    with PushPull(processors=[identity, identity], credits=2,
+                  strategy=Strategy.constant, backend=backend) as pipeline:
+        pipeline.extend(items)
+        sleep(0.2)
+
+        # the bounded output queue limits the number of outstanding results
+        assert pipeline.out_queue.qsize() <= 2
+        assert [pipeline.process() for _ in items] == items
+
+    with pytest.raises(ValueError):
+        PushPull(processors=[identity], credits=0)
+
+
+def test_PushPull_stats(backend):
+    items = list(range(20))
+    processors = [identity, (sleep_randomly, 2)]
+    with PushPull(processors=processors, backend=backend,
+                  strategy=Strategy.push) as pipeline:
+        pipeline.extend(items)
+        for _ in items:
+            pipeline.process()
+
+        stats = pipeline.stats()
+
+    assert [row['name'] for row in stats] == ['identity_', 'sleep_randomly_']
+    assert [row['workers'] for row in stats] == [1, 2]
+
+    for row in stats:
+        assert row['items_in'] == len(items)
+        assert row['items_out'] == len(items)
+        assert 0 <= row['utilization'] <= 1
+        assert row['p50'] <= row['p99']
+
+    # the slowest stage has the highest service time
+    assert stats[1]['mean'] > stats[0]['mean']
+
+
+def test_PushPull_report():
+    output = io.StringIO()
+    with PushPull(processors=[identity], report_interval=0.01,
+                  report_output=output, backend=Backend.thread) as pipeline:
+        assert pipeline.process(1) == 1
+        sleep(0.05)
+
+    rows = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert rows
+    assert rows[-1]['items_out'] == 1
+
+
+@pytest.mark.parametrize('strategy', list(Strategy))
+def test_PushPull_imap(backend, strategy):
+    items = (i for i in range(50))
+    processors = [(sleep_randomly, 3), (duplicate, 2)]
+    with PushPull(processors=processors, strategy=strategy,
+                  backend=backend, max_in_flight=8) as pipeline:
+        results = list(pipeline.imap(items, ordered=True))
+
+        # the iterator is exhausted
+        assert list(pipeline) == []
+
+    assert results == [2 * i for i in range(50)]
+
+
+def raise_after(n: int):
+    yield from range(n)
+    raise KeyError('input')
+
+
+def test_PushPull_imap_with_failing_input(backend):
+    results = []
+    with PushPull(processors=[duplicate], ordered=True,
+                  backend=backend) as pipeline:
+        with pytest.raises(KeyError):
+            for result in pipeline.imap(raise_after(5)):
+                results.append(result)
+
+    # the preceding items are processed
+    assert results == [0, 2, 4, 6, 8]
+
+
+def test_PushPull_imap_after_end_of_stream(backend):
+    with PushPull(processors=[duplicate], backend=backend) as pipeline:
+        assert sorted(pipeline.imap(range(3))) == [0, 2, 4]
+
+        with pytest.raises(RuntimeError):
+            list(pipeline.imap(range(3)))
+
+        with pytest.raises(RuntimeError):
+            pipeline.process(5)
+
+
+def test_PushPull_imap_one_to_many(backend):
+    items = [[1, 2], [3], [4, 5, 6]]
+    with PushPull(processors=[Distributer(), (duplicate, 2)],
+                  backend=backend, batch_size=2) as pipeline:
+        results = list(pipeline.imap(items))
+
+    assert sorted(results) == [2, 4, 6, 8, 10, 12]
+
+
+def test_PushPull_clean_termination():
+    with PushPull(processors=[identity, (identity, 2)]) as pipeline:
+        assert pipeline.process(1) == 1
+
+    # workers have finished rather than being terminated
+    assert [resource.exitcode for resource in pipeline.resources] == [0, 0, 0]
+
+
+def test_Combiner():
+    combiner = Combiner(n=2)
+    combiner.extend([1, 2, 3])
+    assert combiner.ready_to_process()
+    assert combiner.process() == [1, 2]
+    assert not combiner.ready_to_process()
+    assert combiner.finish() == [[3]]
+    assert combiner.finish() == []
+
+    with pytest.raises(IndexError):
+        combiner.process()
+
+
+def test_Combiner_with_window():
+    combiner = Combiner(n=10, window=0.01)
+    combiner.append(1)
+    assert not combiner.ready_to_process()
+
+    sleep(0.02)
+    assert combiner.ready_to_process()
+    assert combiner.process() == [1]
+    assert combiner.deadline() is None
+
+
+def test_PushPull_with_Combiner(backend):
+    items = range(10)
+    summer = Processor.from_function(sum)
+    processors = [(Combiner(n=3), 2), summer]
+    with PushPull(processors=processors, backend=backend,
+                  max_in_flight=2) as pipeline:
+        results = list(pipeline.imap(items))
+
+    # incomplete groups are sent at the end of the stream
+    assert sum(results) == sum(items)
+    assert len(results) in (4, 5)
+
+
+def test_PushPull_with_Combiner_and_Distributer(backend):
+    items = list(range(10))
+    processors = [Combiner(n=4), duplicate, Distributer()]
+    with PushPull(processors=processors, backend=backend) as pipeline:
+        results = list(pipeline.imap(items))
+
+    assert results == [0, 1, 2, 3] * 2 + [4, 5, 6, 7] * 2 + [8, 9] * 2
+
+
+def test_PushPull_with_Combiner_window(backend):
+    with PushPull(processors=[Combiner(n=100, window=0.02)],
+                  backend=backend) as pipeline:
+        pipeline.extend([1, 2, 3])
+
+        # an incomplete group is sent after the time window
+        assert pipeline.process() == [1, 2, 3]
+
+
+def fail_on_three_(x):
+    if x == 3:
+        raise ValueError('three')
+    return x
+
+
+fail_on_three = Processor.from_function(fail_on_three_)
+
+
+class Flaky(Processor):
+    """Fail the first attempt of each item.
+    """
+
+    def __init__(self, *args, **kwds):
+        super().__init__(*args, **kwds)
+        self.seen = set()
+
+    def process_item(self, item):
+        if item not in self.seen:
+            self.seen.add(item)
+            raise ConnectionError(item)
+        return item
+
+
+def test_PushPull_with_dead_letters(backend):
+    items = list(range(6))
+    processors = [fail_on_three, duplicate]
+    with PushPull(processors=processors, ordered=True, backend=backend,
+                  retry=Retry(max_attempts=2, delay=0)) as pipeline:
+        results = list(pipeline.imap(items))
+        stats = pipeline.stats()
+
+    assert results == [0, 2, 4, 8, 10]
+
+    dead_letter, = pipeline.dead_letters
+    assert dead_letter == DeadLetter('fail_on_three_', 3, 'ValueError: three', 2)
+    assert stats[0]['errors'] == 2
+    assert stats[0]['failures'] == 1
+
+
+def test_PushPull_with_retries(backend):
+    items = list(range(6))
+    retry = Retry(max_attempts=2, delay=0, exceptions=(ConnectionError,))
+    with PushPull(processors=[Flaky()], backend=backend,
+                  retry=retry) as pipeline:
+        results = list(pipeline.imap(items))
+
+    assert sorted(results) == items
+    assert pipeline.dead_letters == []
+
+
+def test_PushPull_process_with_error():
+    with PushPull(processors=[fail_on_three], backend=Backend.thread) as pipeline:
+        assert pipeline.process(1) == 1
+
+        with pytest.raises(ProcessingError):
+            pipeline.process(3)
+
+        assert pipeline.process(2) == 2
+
+
+def crash_on_three_(x):
+    if x == 3:
+        # wait until previous results have been sent
+        sleep(0.1)
+        os._exit(1)
+    return x
+
+
+crash_on_three = Processor.from_function(crash_on_three_)
+
+
+def test_PushPull_restarts_crashed_workers():
+    items = list(range(6))
+    with PushPull(processors=[crash_on_three, duplicate]) as pipeline:
+        results = list(pipeline.imap(items))
+
+    # the item that caused the crash is lost
+    assert sorted(results) == [0, 2, 4, 8, 10]
+    assert pipeline.n_restarts == 1
+
+
+def test_PushPull_ordered_with_crashed_worker():
+    items = list(range(6))
+    with PushPull(processors=[crash_on_three, duplicate],
+                  ordered=True, timeout=5) as pipeline:
+        # rather than waiting for the lost item
+        with pytest.raises(WorkerCrashError):
+            list(pipeline.imap(items))
+
+    assert pipeline.n_restarts == 1
+
+
+def test_Retry_without_attempts():
+    with pytest.raises(ValueError):
+        Retry(max_attempts=0)
+
+
+def test_PushPull_with_timeout(backend):
+    # synchronous processors would block the event loop
+    slow = Processor.from_function(asyncio.sleep if backend == Backend.asyncio
+                                   else sleep)
+    with PushPull(processors=[slow], timeout=0.01, backend=backend) as pipeline:
+        with pytest.raises(TimeoutError):
+            pipeline.process(0.2)
+
+
+async def sleep_async_(x):
+    await asyncio.sleep(0.05)
+    return x
+
+
+sleep_async = Processor.from_function(sleep_async_)
+
+
+def test_PushPull_with_asyncio_backend():
+    items = list(range(20))
+    t1 = perf_counter()
+    with PushPull(processors=[(sleep_async, 20)], ordered=True,
+                  backend=Backend.asyncio) as pipeline:
+        pipeline.extend(items)
+        results = [pipeline.process() for _ in items]
+
+    assert results == items
+    assert perf_counter() - t1 < 0.5
+    assert pipeline.loop.is_closed()
+
+
+def test_PushPull_with_thread_backend():
+    # processors do not have to be picklable
+    increment = Processor.from_function(lambda x: x + 1)
+    with PushPull(processors=[increment], backend=Backend.thread) as pipeline:
+        assert pipeline.process(1) == 2
+
+    with pytest.raises(ValueError):
+        PushPull(processors=[identity], backend=Backend.thread,
+                 transport=SharedMemoryTransport())
+
+
+def double_array_(x):
+    return x * 2
+
+
+def increment_array_(x):
+    # modify a view in-place
+    x += 1
+    return x
+
+
+double_array = Processor.from_function(double_array_)
+increment_array = Processor.from_function(increment_array_)
+
+
+def test_PushPull_with_shared_memory():
+    items = [np.full(100_000, i) for i in range(8)]
+    transport = SharedMemoryTransport(min_size=1024)
+    processors = [increment_array, (double_array, 2), identity]
+
+    blocks = list_shared_memory()
+    with PushPull(processors=processors, ordered=True,
+                  transport=transport) as pipeline:
+        pipeline.extend(items)
+        results = [pipeline.process() for _ in items]
+
+    for i, result in enumerate(results):
+        assert isinstance(result, np.ndarray)
+        assert (result == (i + 1) * 2).all()
+
+    # inputs are copied rather than modified
+    assert (items[0] == 0).all()
+
+    # all shared memory blocks have been freed
+    assert list_shared_memory() <= blocks
+
+
+def test_PushPull_with_shared_memory_and_Combiner():
+    processors = [Combiner(n=2), identity]
+    with pytest.raises(ValueError):
+        PushPull(processors=processors, transport=SharedMemoryTransport())
+
+
+def list_shared_memory() -> set:
+    if not os.path.isdir('/dev/shm'):
+        return set()
+    return set(os.listdir('/dev/shm'))
+
+
 class disabled_tests:
     # TODO fix below testcases
 
@@ -52,10 +507,10 @@ class disabled_tests:
         processes = []
         with mp.Manager() as manager:
             delivery_queues = []
-            demand_queues = []
+            demand = []
             for i in range(n_resources + 1):
                 delivery_queues.append(manager.Queue())
-                demand_queues.append(manager.Queue())
+                demand.append(manager.Semaphore(0))
 
             in_queue = delivery_queues[0]
             out_queue = delivery_queues[-1]
@@ -64,7 +519,7 @@ class disabled_tests:
                 resource = Resource(
                     Processor(),
                     delivery_queues[i:i+2],
-                    demand_queues[i:i+2],
+                    demand[i:i+2],
                     strategy=Strategy.pull)
                 process = mp.Process(target=resource.start)
                 processes.append(process)
@@ -79,7 +534,7 @@ class disabled_tests:
             in_queue.put(value)
 
             # simulate demand
-            demand_queues[-1].put(1)
+            demand[-1].release()
 
             # timeout must be significant
             result = out_queue.get(timeout=2.3)
@@ -0,0 +1,92 @@
+from collections import Counter
+import pytest
+
+from mash.server.server import serve_in_background
+from mash.webtools.parallel import asynchronous
+from mash.webtools.parallel_requests import load_test
+from mash.webtools.scenario import Request, Scenario, example_yaml_data, format_template
+
+
+def test_scenario_from_yaml():
+    scenario = Scenario.from_yaml(example_yaml_data)
+    assert len(scenario.requests) == 2
+    assert all(isinstance(r, Request) for r in scenario.requests)
+    assert scenario.requests[1].method == 'POST'
+    assert list(scenario.results) == ['get_user', 'create_user']
+
+
+def test_scenario_invalid():
+    with pytest.raises(ValueError):
+        Scenario([])
+
+    with pytest.raises(ValueError):
+        Scenario.from_dict({'requests': [{'name': 'a', 'path': ''}],
+                            'unknown_key': 1})
+
+    with pytest.raises(ValueError):
+        Scenario([Request('a', '', weight=0)])
+
+    with pytest.raises(ValueError):
+        Scenario([Request('a', '')], variables={'user': []})
+
+    with pytest.raises(ValueError):
+        Scenario([Request('a', ''), Request('a', '/other')])
+
+
+def test_scenario_weights():
+    scenario = Scenario([Request('a', 'a', weight=70),
+                         Request('b', 'b', weight=30)])
+    counts = Counter(scenario.choose().name for _ in range(2000))
+    assert 0.6 < counts['a'] / 2000 < 0.8
+
+
+def test_request_render():
+    request = Request('a', 'users/{id}', method='post',
+                      headers={'X-Index': '{i}'},
+                      json={'names': ['user_{i}'], 'n': 1})
+    kwds = request.render({'i': 3, 'id': 1000})
+    assert kwds == {'method': 'POST',
+                    'url': 'users/1000',
+                    'headers': {'X-Index': '3'},
+                    'json': {'names': ['user_3'], 'n': 1}}
+
+
+def test_format_template():
+    assert format_template('{a}', {'a': 1}) == '1'
+    assert format_template(None, {}) is None
+    assert format_template([{'b': '{a}'}], {'a': 2}) == [{'b': '2'}]
+
+
+def test_scenario_template_variables():
+    scenario = Scenario([Request('a', '')], variables={'id': [1, 2]})
+    assert scenario.template_variables(0) == {'id': 1, 'i': 0}
+    assert scenario.template_variables(3) == {'id': 2, 'i': 3}
+
+
+def test_scenario_with_server():
+    with serve_in_background() as url:
+        scenario = Scenario.from_yaml(example_yaml_data)
+        scenario.url = url + '/v1/'
+        results, errors = asynchronous(scenario.request, range(20),
+                                       concurrency=2)
+
+    assert not errors
+    assert len(results) == 20
+
+    summary = scenario.summary()
+    assert sum(s['N'] for s in summary.values()) == 20
+    if summary['get_user']['N']:
+        assert set(summary['get_user']['status']) == {200}
+        assert summary['get_user']['p99'] >= summary['get_user']['p50']
+    if summary['create_user']['N']:
+        assert set(summary['create_user']['status']) == {201}
+
+
+def test_load_test():
+    with serve_in_background() as url:
+        scenario = Scenario.from_yaml(example_yaml_data)
+        scenario.url = url + '/v1/'
+        summary = load_test(scenario, n=20, duration=5, batch_size=5,
+                            n_threads=2, concurrency=2)
+
+    assert sum(s['N'] for s in summary.values()) == 20
@@ -0,0 +1,63 @@
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+import pytest
+
+from mash.webtools.transport import Handle, SharedMemoryTransport, reference_count
+
+
+def test_transport_small_payload():
+    transport = SharedMemoryTransport(min_size=100)
+    for payload in (b'abc', np.zeros(2), 'a' * 1000, [b'a' * 1000]):
+        assert transport.encode(payload) is payload
+        assert transport.load(payload) is payload
+
+
+def test_transport_bytes():
+    transport = SharedMemoryTransport(min_size=100)
+    payload = bytes(range(256)) * 4
+    handle = transport.encode(payload)
+    assert isinstance(handle, Handle)
+
+    shm, view = transport.attach(handle)
+    assert bytes(view) == payload
+    view.release()
+    shm.close()
+
+    assert transport.load(handle) == payload
+
+    # the block has been freed
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(handle.name)
+
+
+def test_transport_array():
+    transport = SharedMemoryTransport(min_size=100)
+    payload = np.arange(1000).reshape(10, 100)
+    handle = transport.encode(payload)
+    assert handle.shape == (10, 100)
+
+    # attached payloads are views
+    shm, view = transport.attach(handle)
+    view[0, 0] = -1
+    del view
+    shm.close()
+
+    result = transport.load(handle)
+    assert result[0, 0] == -1
+    assert (result[1:] == payload[1:]).all()
+
+
+def test_transport_reference_count():
+    transport = SharedMemoryTransport(min_size=1)
+    handle = transport.encode(b'abc')
+    transport.acquire(handle)
+
+    shm = SharedMemory(handle.name)
+    assert reference_count(shm) == 2
+    shm.close()
+
+    transport.release(handle)
+    assert transport.load(handle) == b'abc'
+
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(handle.name)
@@ -1,7 +1,9 @@
+from dataclasses import dataclass
+from json import dumps, loads
 from operator import contains, eq
 from pytest import raises
 
-from mash.util import concat, constant, equals, find_prefix_matches, find_fuzzy_matches, for_all, for_any, glob, identity, is_alpha, is_digit, list_prefix_matches, match_words, not_equals, split, split_sequence, split_tips
+from mash.util import Encoder, dataclass_name, dataclass_registry, deserialize_dataclasses, concat, constant, equals, find_prefix_matches, find_fuzzy_matches, for_all, for_any, glob, identity, is_alpha, is_digit, list_prefix_matches, match_words, not_equals, register_dataclass, split, split_sequence, split_tips
 
 
 def test_concat_empty_container():
@@ -249,3 +251,37 @@ def test_equals():
 def test_not_equals():
     assert not_equals(1, 2, 3)
     assert not not_equals(1, 1, 1)
+
+
+@register_dataclass
+@dataclass
+class Point:
+    x: int
+    y: int = 0
+
+
+@register_dataclass
+@dataclass
+class Line:
+    start: Point
+    end: Point
+
+
+def test_serialize_dataclasses():
+    line = Line(Point(1), Point(2, 3))
+    data = loads(dumps([line], cls=Encoder))
+
+    assert data[0]['start'] == {'x': 1, 'y': 0, Encoder._dataclass_key: f'{__name__}.Point'}
+    assert deserialize_dataclasses(data) == [line]
+
+    with raises(TypeError):
+        deserialize_dataclasses({Encoder._dataclass_key: 'Unknown'})
+
+
+def test_register_dataclass():
+    assert dataclass_registry[dataclass_name(Point)] is Point
+    assert register_dataclass(Point) is Point
+
+    # a different class with the same name
+    with raises(ValueError):
+        register_dataclass(dataclass(type('Point', (), {'__module__': __name__})))